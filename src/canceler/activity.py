@@ -1,53 +1,216 @@
 from __future__ import annotations
 import uuid
 import os
+import base64
+import random
+import time
 import asyncio
-from typing import List
+import itertools
+from bisect import insort
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Set, Tuple
 from dotenv import load_dotenv
 from temporalio import activity
-from temporalio.client import Client
+from temporalio.client import Client, WorkflowExecution
+from temporalio.common import SearchAttributeKey
 from temporalio.api.workflowservice.v1 import StartBatchOperationRequest
 from temporalio.api.batch.v1 import BatchOperationCancellation, BatchOperationTermination
 from temporalio.api.enums.v1 import BatchOperationState
 from temporalio.api.workflowservice.v1 import StartBatchOperationRequest, DescribeBatchOperationRequest
 from temporalio.exceptions import ApplicationError
-from config import TEMPORAL_MAIN_API_KEY, TEMPORAL_MAIN_NAMESPACE, TEMPORAL_MAIN_ADDRESS
+from temporalio.service import RPCError, RPCStatusCode
+from config import TEMPORAL_MAIN_API_KEY, TEMPORAL_MAIN_NAMESPACE, TEMPORAL_MAIN_ADDRESS, TEMPORAL_TLS, QUERY_PAGE_SIZE, QUERY_PAGE_ROWS
+from config import CANCEL_CONCURRENCY, CANCEL_INITIAL_CONCURRENCY, TERMINATE_P99_SECONDS, VISIBILITY_CONCURRENCY, VISIBILITY_P99_SECONDS
+from config import TERMINATE_MAX_ATTEMPTS, TERMINATE_RETRY_BASE_SECONDS, TERMINATE_RETRY_MAX_SECONDS, CLIENT_POOL_SIZE, LOG_SAMPLE_ROWS
+from config import TERMINATED_FILTER_BITS, TERMINATED_FILTER_HASHES
+from models import WorkflowPage, ConfirmResult, TerminateSummary, ShardResult, BatchProgress, RunFilter, visibility_time, parse_visibility_time
+from limiter import AdaptiveLimiter, THROTTLE_CODES
+from client_pool import ClientPool
+from telemetry import metrics
 
-_CLIENT_CACHE: Client | None = None
+# Terminate outcomes. NotFound means the run is already closed, which is as good as terminated.
+TERMINATED, ALREADY_CLOSED, RETRYABLE, FAILED = "terminated", "already_closed", "retryable", "failed"
+RETRYABLE_CODES = THROTTLE_CODES | {RPCStatusCode.ABORTED, RPCStatusCode.INTERNAL}
 
-async def _get_client() -> Client:
-    global _CLIENT_CACHE
-    if _CLIENT_CACHE is not None:
-        return _CLIENT_CACHE
+# Shared by every activity in this worker process so they learn one limit per RPC type
+TERMINATE_LIMITER = AdaptiveLimiter("terminate", CANCEL_INITIAL_CONCURRENCY, CANCEL_CONCURRENCY, TERMINATE_P99_SECONDS)
+LIST_LIMITER = AdaptiveLimiter("list", VISIBILITY_CONCURRENCY, VISIBILITY_CONCURRENCY, VISIBILITY_P99_SECONDS)
+COUNT_LIMITER = AdaptiveLimiter("count", VISIBILITY_CONCURRENCY, VISIBILITY_CONCURRENCY, VISIBILITY_P99_SECONDS)
+DESCRIBE_LIMITER = AdaptiveLimiter("describe", VISIBILITY_CONCURRENCY, VISIBILITY_CONCURRENCY, VISIBILITY_P99_SECONDS)  # batch job status
 
-    api_key = TEMPORAL_MAIN_API_KEY
-    address = TEMPORAL_MAIN_ADDRESS
-    namespace = TEMPORAL_MAIN_NAMESPACE
-    print(api_key, address, namespace)
-    if not api_key:
+async def _connect() -> Client:
+    if TEMPORAL_TLS and not TEMPORAL_MAIN_API_KEY:
         raise RuntimeError("TEMPORAL_API_KEY_MAIN is required to connect to Temporal Cloud")
-
-    _CLIENT_CACHE = await Client.connect(
-        address,
-        namespace=namespace,
-        api_key=api_key,
-        tls=True,
+    return await Client.connect(
+        TEMPORAL_MAIN_ADDRESS,
+        namespace=TEMPORAL_MAIN_NAMESPACE,
+        api_key=TEMPORAL_MAIN_API_KEY,
+        tls=TEMPORAL_TLS,
     )
-    return _CLIENT_CACHE
+
+# Connections to the main namespace; the worker closes the pool on shutdown
+CLIENTS = ClientPool(CLIENT_POOL_SIZE, _connect)
+
+# Read back from listings so terminations can be queued fairly per workload
+WORKLOAD_KEY = SearchAttributeKey.for_keyword("WorkloadId")
+
+# Running count of terminate calls in this process, for sampling their logs
+_TERMINATE_CALLS = itertools.count(1)
+
+def _sampled(n: int) -> bool:
+    # Per-row logs are one in LOG_SAMPLE_ROWS, so 100k-row passes don't spend their time logging
+    return LOG_SAMPLE_ROWS > 0 and n % LOG_SAMPLE_ROWS == 0
+
+def _record_page(rows: Sequence[Any], elapsed: float, listed: int) -> None:
+    m = metrics()
+    m.list_page_latency.record(timedelta(seconds=elapsed))
+    m.list_page_rows.record(len(rows))
+    activity.logger.info("Listed page of %d rows in %.3fs", len(rows), elapsed,
+                         extra={"event": "list_page", "rows": len(rows), "seconds": round(elapsed, 3), "listed": listed})
+
+def _workload(wf: WorkflowExecution) -> str:
+    return wf.typed_search_attributes.get(WORKLOAD_KEY) or ""
+
+def _interleave(workloads: Sequence[str]) -> List[int]:
+    # Row indices taking one row from each workload in turn, so a page that is mostly one workload doesn't queue the rest behind it.
+    # Deterministic, so a retried attempt sees the same order and its heartbeat cursor still applies.
+    lanes: Dict[str, List[int]] = {}
+    for i, workload in enumerate(workloads):
+        lanes.setdefault(workload, []).append(i)
+    return [i for turn in itertools.zip_longest(*lanes.values()) for i in turn if i is not None]
+
+def _new_wf_query(target: str, timestamp: str, exclude_ids: Optional[List[str]] = None, until: Optional[str] = None, extra_filter: Optional[str] = None) -> str:
+    # Running workflows that match the target filter (see models.workload_filter) and started after the batch job
+    query = f'({target}) AND ExecutionStatus = "Running" AND `StartTime`>="{timestamp}"'
+    if until:
+        # Upper bound of a shard's StartTime range
+        query += f' AND `StartTime`<"{until}"'
+    if extra_filter:
+        query += f" AND ({extra_filter})"
+    if exclude_ids:
+        # IDs already seen at exactly `timestamp`; everything else at that instant is still new
+        query += " AND WorkflowId NOT IN (" + ", ".join(f'"{wf_id}"' for wf_id in exclude_ids) + ")"
+    return query
 
 #This activity checks for any workflow exeuctions spawned after the start of the batch job
 @activity.defn
-async def query_new_wf_executions(workload_id: int, timestamp) -> List[str]:
-    client = await _get_client()
-    # Query running workflows that match the WorkloadId search attribute
-    query = f'WorkloadId = "{workload_id}" AND ExecutionStatus = "Running" AND `StartTime`>="{timestamp}"'
+async def query_new_wf_executions(target: str, timestamp) -> List[str]:
+    # Query running workflows that match the target filter
+    query = _new_wf_query(target, timestamp)
     ids: List[str] = []
-    async for wf in client.list_workflows(query=query):
-        # wf has execution.workflow_id and run_id
-        print(wf.id)
-        ids.append(wf.id)
+    token: Optional[bytes] = None
+    while True:
+        # One list call per limiter slot, like query_wf_executions_page
+        async with LIST_LIMITER.slot(), CLIENTS.lease() as client:
+            page = client.list_workflows(query=query, page_size=QUERY_PAGE_SIZE, next_page_token=token)
+            await page.fetch_next_page()
+        for wf in page.current_page or []:
+            # wf has execution.workflow_id and run_id
+            ids.append(wf.id)
+            if _sampled(len(ids)):
+                activity.logger.info("Listed %s (row %d)", wf.id, len(ids), extra={"event": "listed", "workflow_id": wf.id, "row": len(ids)})
+        token = page.next_page_token
+        if not token:
+            break
+    activity.logger.info("Listed %d workflows", len(ids), extra={"event": "list_done", "rows": len(ids)})
     return ids
 
+#Paged variant of query_new_wf_executions. Returns up to max_rows IDs plus a token for the next call,
+#heartbeating the visibility token after every page so a retried attempt resumes where the last one stopped.
+#Also reports the newest StartTime seen so the workflow can advance its watermark.
+@activity.defn
+async def query_wf_executions_page(target: str, timestamp: str, next_page_token: Optional[str] = None, exclude_ids: Optional[List[str]] = None, until: Optional[str] = None, extra_filter: Optional[str] = None, max_rows: int = QUERY_PAGE_ROWS) -> WorkflowPage:
+    query = _new_wf_query(target, timestamp, exclude_ids, until, extra_filter)
+    ids: List[str] = []
+    run_ids: List[str] = []
+    workloads: List[str] = []
+    latest: Optional[str] = None
+    latest_ids: List[str] = []
+    token = next_page_token
+
+    details = activity.info().heartbeat_details
+    if details:
+        token, ids, run_ids, latest, latest_ids, workloads = details[0], list(details[1]), list(details[2]), details[3], list(details[4]), list(details[5])
+
+    while True:
+        async with LIST_LIMITER.slot(), CLIENTS.lease() as client:
+            start = time.monotonic()
+            page = client.list_workflows(
+                query=query,
+                page_size=min(QUERY_PAGE_SIZE, max_rows - len(ids)),
+                next_page_token=base64.b64decode(token) if token else None,
+            )
+            await page.fetch_next_page()
+        rows = page.current_page or []
+        _record_page(rows, time.monotonic() - start, len(ids) + len(rows))
+        for wf in rows:
+            ids.append(wf.id)
+            if _sampled(len(ids)):
+                activity.logger.info("Listed %s (row %d)", wf.id, len(ids), extra={"event": "listed", "workflow_id": wf.id, "row": len(ids)})
+            run_ids.append(wf.run_id)
+            workloads.append(_workload(wf))
+            started = visibility_time(wf.start_time)
+            if latest is None or started > latest:
+                latest, latest_ids = started, [wf.id]
+            elif started == latest:
+                latest_ids.append(wf.id)
+        token = base64.b64encode(page.next_page_token).decode("ascii") if page.next_page_token else None
+        if token is None or len(ids) >= max_rows:
+            return WorkflowPage(workflow_ids=ids, run_ids=run_ids, workloads=workloads, next_page_token=token, latest_start_time=latest, latest_ids=latest_ids)
+        activity.heartbeat(token, ids, run_ids, latest, latest_ids, workloads)
+
+#Counts what query_wf_executions_page would list, so the workflow can size its shards
+@activity.defn
+async def count_new_wf_executions(target: str, timestamp: str, exclude_ids: Optional[List[str]] = None) -> int:
+    async with COUNT_LIMITER.slot(), CLIENTS.lease() as client:
+        return (await client.count_workflows(_new_wf_query(target, timestamp, exclude_ids))).count
+
+async def _split_bounds(count_before: Callable[[str], Awaitable[int]], timestamp: str, until: str, shards: int, matching: int) -> List[str]:
+    # Places each inner bound on StartTime so the rows before it are within a tenth of a shard of its share.
+    # A search back from until, widening eightfold per count, brackets the rows first: after a batch job they all
+    # started recently, and bisecting down from EPOCH would spend a couple of dozen counts finding none or all of them.
+    # Every count is kept, and each bound bisects the narrowest bracket the counts so far give it.
+    start, end = parse_visibility_time(timestamp), parse_visibility_time(until)
+    tolerance = max(1, matching // (shards * 10))
+    known: List[Tuple[datetime, int]] = [(start, 0), (end, matching)]  # (StartTime, rows before it), in time order
+
+    async def sample(at: datetime) -> int:
+        n = await count_before(visibility_time(at))
+        insort(known, (at, n))
+        return n
+
+    step = timedelta(seconds=1)
+    while end - step > start and await sample(end - step) > tolerance:
+        step *= 8
+
+    async def bound(rows: int) -> str:
+        while True:
+            for at, n in known:
+                if start < at < end and abs(n - rows) <= tolerance:
+                    return visibility_time(at)
+            # Rows can be terminated or started while we count, so counts needn't rise with time; keep hi above lo
+            lo = max(at for at, n in known if n < rows)
+            hi = min((at for at, n in known if n > rows and at > lo), default=end)
+            if hi - lo <= timedelta(milliseconds=1):
+                return visibility_time(hi)
+            await sample(lo + (hi - lo) / 2)
+
+    bounds = await asyncio.gather(*(bound(matching * k // shards) for k in range(1, shards)))
+    # Rows bunched at one instant can give neighbouring shards the same bound; they collapse into one shard
+    return sorted(b for b in set(bounds) if timestamp < b < until)
+
+#Picks StartTime bounds that split the rows count_new_wf_executions counted into shards of about equal size.
+#Equal time slices from the watermark would put nearly every row in the last shard when the watermark is EPOCH.
+@activity.defn
+async def split_start_times(target: str, timestamp: str, until: str, shards: int, matching: int, exclude_ids: Optional[List[str]] = None) -> List[str]:
+    async def count_before(bound: str) -> int:
+        async with COUNT_LIMITER.slot(), CLIENTS.lease() as client:
+            count = (await client.count_workflows(_new_wf_query(target, timestamp, exclude_ids, bound))).count
+        activity.heartbeat()
+        return count
+
+    return await _split_bounds(count_before, timestamp, until, shards, matching)
+
 #This batch cancler function is not currently supported in the python SDK, take a look at the implementation in Java under the app folder. 
 """@activity.defn
 async def batch_cancel_workflows() -> None:
@@ -67,68 +230,282 @@ async def batch_cancel_workflows() -> None:
     activity.logger.info(response)
     return response"""
 
-#A sample activity for tracking batch execution(s); Not currently utilized by the workflow. 
-"""@activity.defn
-async def track_batch(jobId:str):
-    client = _get_client()
+#Tracks server-side batch job(s) until they all finish or max_wait_seconds pass, heartbeating the combined progress.
+#Polls faster while the jobs are close to done at the observed completion rate and slower while they're far off or stalled.
+@activity.defn
+async def track_batch(job_ids: List[str], max_wait_seconds: float = 60) -> BatchProgress:
+    min_sleep = float(os.getenv("TRACK_MIN_POLL_SECONDS", "2"))
+    max_sleep = float(os.getenv("TRACK_MAX_POLL_SECONDS", "30"))
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max_wait_seconds
+    last: Optional[Tuple[float, int]] = None
+
+    async def describe(job_id: str) -> Any:
+        async with DESCRIBE_LIMITER.slot(), CLIENTS.lease() as client:
+            return await client.workflow_service.describe_batch_operation(
+                DescribeBatchOperationRequest(namespace=client.namespace, job_id=job_id)
+            )
 
     while True:
-        response = await client.workflow_service.describe_batch_operation({
-        'jobId': jobId, 
-        'namespace': 'default'
-        })
-
-        activity.logger.info(f"Cancelation Status Update -- Status = {response}")
-
-        if response.state == BatchOperationState.BATCH_OPERATION_STATE_FAILED:
-            raise Error('Failed to cleanup workflows in tests')
-    
-        if response.state == BatchOperationState.BATCH_OPERATION_STATE_RUNNING:
-            asyncio.sleep(120)
-            continue
-        if response.state == BatchOperationState.BATCH_OPERATION_STATE_COMPLETED:
-            return True
+        responses = await asyncio.gather(*(describe(job_id) for job_id in job_ids))
+        progress = BatchProgress(done=True)
+        for job_id, response in zip(job_ids, responses):
+            progress.completed += response.complete_operation_count
+            progress.failed += response.failure_operation_count
+            progress.total += response.total_operation_count
+            if response.state == BatchOperationState.BATCH_OPERATION_STATE_FAILED:
+                progress.failed_jobs.append(job_id)
+            elif response.state != BatchOperationState.BATCH_OPERATION_STATE_COMPLETED:
+                progress.done = False
+        activity.heartbeat(progress.completed, progress.failed, progress.total)
+
+        now = loop.time()
+        if progress.done or now >= deadline:
+            return progress
+
+        handled = progress.completed + progress.failed
+        if last is None:
+            sleep = min_sleep
+        elif handled > last[1]:
+            # Check back around halfway to the estimated finish
+            rate = (handled - last[1]) / (now - last[0])
+            sleep = min(max((progress.total - handled) / rate / 2, min_sleep), max_sleep)
         else:
-            raise ApplicationError("Error: Unexpected Batch Process State")
-"""
-#Bulk cancelataion of workflow executions using semaphor
+            sleep = max_sleep
+        last = (now, handled)
+        await asyncio.sleep(min(sleep, deadline - now))
+
+def _retry_delay(attempt: int) -> float:
+    # Full jitter over an exponentially growing window
+    return random.uniform(0, min(TERMINATE_RETRY_MAX_SECONDS, TERMINATE_RETRY_BASE_SECONDS * 2 ** (attempt - 1)))
+
+async def _terminate_once(workflow_id: str, run_id: Optional[str], summary: TerminateSummary, workload: str = "") -> Tuple[str, Optional[str]]:
+    # One terminate call classified by gRPC status; returns (outcome, status name) and records its latency in summary.
+    # Waits for a terminate slot in its workload's queue, so workloads take turns at the shared budget.
+    start = time.monotonic()
+    try:
+        async with TERMINATE_LIMITER.slot(workload), CLIENTS.lease() as client:
+            start = time.monotonic()
+            # Target the exact run from the listing instead of having the server resolve the current run
+            await client.get_workflow_handle(workflow_id=workflow_id, run_id=run_id).terminate()
+        result, status = TERMINATED, None
+    except RPCError as err:
+        status = err.status.name if err.status is not None else "UNKNOWN"
+        if err.status == RPCStatusCode.NOT_FOUND:
+            result = ALREADY_CLOSED
+        elif err.status in RETRYABLE_CODES:
+            result = RETRYABLE
+        else:
+            result = FAILED
+    except Exception as err:
+        result, status = FAILED, type(err).__name__
+    elapsed = time.monotonic() - start
+    summary.observe(result, elapsed)
+    m = metrics()
+    m.terminate_latency.record(timedelta(seconds=elapsed), {"outcome": result})
+    m.terminate_outcomes.add(1, {"outcome": result, "status": status or "OK"})
+    n = next(_TERMINATE_CALLS)
+    if _sampled(n):
+        activity.logger.info("Terminate %s: %s in %.3fs (call %d)", workflow_id, result, elapsed, n,
+                             extra={"event": "terminate", "workflow_id": workflow_id, "outcome": result, "status": status, "seconds": round(elapsed, 3)})
+    return result, status
+
+#Bulk cancelataion of workflow executions using a fixed pool of workers draining a bounded queue.
+#Failures are classified by gRPC status: NotFound counts as done, throttling and transient errors go back on the
+#queue after a jittered backoff, anything else fails the ID. Heartbeats a cursor below which every ID has been
+#handled, with the summary of just those rows, so a retried attempt skips that prefix without counting the rest twice. With workloads (parallel to workflow_ids) the rows are taken
+#round-robin by workload, and the cursor counts rows in that order.
 @activity.defn
-async def bulk_cancel_workflows(workflow_ids: List[str]) -> int:
-    client = await _get_client()
-    # Fire off cancellations in parallel with some throttling
-    sem = asyncio.Semaphore(int(os.getenv("CANCEL_CONCURRENCY", "750")))
-
-    async def cancel_one(wf_id: str) -> bool:
-        async with sem:
-            try:
-                handle = client.get_workflow_handle(workflow_id=wf_id)
-                await handle.terminate()
-                return True
-            except Exception:
-                return False
-
-    results = await asyncio.gather(*(cancel_one(wf_id) for wf_id in workflow_ids))
-    return sum(1 for ok in results if ok)
-
-#This activity checks whether all activities have been canceled for a certain amount of time and returns the outcome
+async def bulk_cancel_workflows(workflow_ids: List[str], run_ids: Optional[List[str]] = None, concurrency: int = 0, workloads: Optional[List[str]] = None) -> TerminateSummary:
+    # Enough workers for the limiter's ceiling, or fewer if the workflow asked for less; the limiter decides how many are in flight at once
+    concurrency = min(concurrency, CANCEL_CONCURRENCY) if concurrency > 0 else CANCEL_CONCURRENCY
+    total = len(workflow_ids)
+    order = _interleave(workloads) if workloads else list(range(total))
+
+    details = activity.info().heartbeat_details
+    cursor, summary = (int(details[0]), TerminateSummary(**details[1])) if details else (0, TerminateSummary())
+    outcome: List[Optional[str]] = [None] * total
+    failed_status: Dict[int, str] = {}
+    # Latencies and retries of rows the cursor hasn't passed yet; folded into summary as it does
+    unsettled: Dict[int, TerminateSummary] = {}
+    queue: asyncio.Queue[Tuple[int, int]] = asyncio.Queue(maxsize=concurrency * 2)
+    unresolved = total - cursor
+    all_resolved = asyncio.Event()
+    backoffs: Set[asyncio.Task] = set()
+
+    async def terminate_one(i: int) -> Tuple[str, Optional[str]]:
+        row = order[i]
+        return await _terminate_once(workflow_ids[row], run_ids[row] if run_ids else None, unsettled.setdefault(i, TerminateSummary()),
+                                     workloads[row] if workloads else "")
+
+    def resolve(i: int, result: str, status: Optional[str]) -> None:
+        nonlocal unresolved
+        outcome[i] = result
+        if result == FAILED:
+            failed_status[i] = status or "UNKNOWN"
+        unresolved -= 1
+        if unresolved == 0:
+            all_resolved.set()
+
+    async def requeue(i: int, attempt: int) -> None:
+        await asyncio.sleep(_retry_delay(attempt))
+        await queue.put((i, attempt + 1))
+
+    async def drain() -> None:
+        while True:
+            i, attempt = await queue.get()
+            result, status = await terminate_one(i)
+            if result != RETRYABLE:
+                resolve(i, result, status)
+            elif attempt >= TERMINATE_MAX_ATTEMPTS:
+                resolve(i, FAILED, status)
+            else:
+                unsettled[i].retries += 1
+                task = asyncio.create_task(requeue(i, attempt))
+                backoffs.add(task)
+                task.add_done_callback(backoffs.discard)
+
+    def advance() -> None:
+        nonlocal cursor
+        while cursor < total and outcome[cursor] is not None:
+            if cursor in unsettled:
+                summary.merge(unsettled.pop(cursor))
+            if outcome[cursor] == TERMINATED:
+                summary.terminated += 1
+            elif outcome[cursor] == ALREADY_CLOSED:
+                summary.already_closed += 1
+            else:
+                summary.failed += 1
+                status = failed_status.pop(cursor)
+                summary.failed_by_status[status] = summary.failed_by_status.get(status, 0) + 1
+            cursor += 1
+
+    async def report() -> None:
+        while True:
+            advance()
+            activity.heartbeat(cursor, summary)
+            await asyncio.sleep(1)
+
+    if unresolved == 0:
+        return summary
+    started = time.monotonic()
+    workers = [asyncio.create_task(drain()) for _ in range(min(concurrency, unresolved))]
+    reporter = asyncio.create_task(report())
+    try:
+        for i in range(cursor, total):
+            await queue.put((i, 1))
+        await all_resolved.wait()
+    finally:
+        for task in [reporter, *workers, *backoffs]:
+            task.cancel()
+    advance()
+    elapsed = time.monotonic() - started
+    activity.logger.info(
+        "Handled %d workflows in %.1fs (%d terminated, %d already closed, %d failed, %d retries)",
+        total, elapsed, summary.terminated, summary.already_closed, summary.failed, summary.retries,
+        extra={"event": "terminate_batch", "rows": total, "seconds": round(elapsed, 1), "terminated": summary.terminated,
+               "already_closed": summary.already_closed, "failed": summary.failed, "retries": summary.retries},
+    )
+    return summary
+
+#Small-round fast path, run as a local activity by BulkCancelWorkflow once only a few stragglers are left.
+#Lists a single page of up to max_rows and terminates it with one attempt per ID; anything retryable is counted as
+#failed so the workflow holds its watermark and picks it up on the next pass. No heartbeats: local activities can't
+#record them. Sets truncated when more rows matched than fit, so the caller can fall back to regular activities.
+#Rows in skip (a RunFilter dump) were already closed and are left alone; the runs closed here come back in closed.
 @activity.defn
-async def confirm_all_canceled(workload_id: int) -> bool:
-    client = await _get_client()
-    # Poll until there are no running workflows with the workload_id
-    # Give up after a timeout window
+async def terminate_stragglers(target: str, timestamp: str, exclude_ids: Optional[List[str]] = None, max_rows: int = 200, skip: Optional[str] = None) -> ShardResult:
+    query = _new_wf_query(target, timestamp, exclude_ids)
+    async with LIST_LIMITER.slot(), CLIENTS.lease() as client:
+        start = time.monotonic()
+        page = client.list_workflows(query=query, page_size=max_rows)
+        await page.fetch_next_page()
+    rows = page.current_page or []
+    _record_page(rows, time.monotonic() - start, len(rows))
+    result = ShardResult(truncated=page.next_page_token is not None)
+    for wf in rows:
+        started = visibility_time(wf.start_time)
+        if result.latest_start_time is None or started > result.latest_start_time:
+            result.latest_start_time, result.latest_ids = started, [wf.id]
+        elif started == result.latest_start_time:
+            result.latest_ids.append(wf.id)
+
+    summary = result.summary
+    seen = RunFilter.load(skip) if skip else None
+    if seen is not None and seen.count:
+        kept = [wf for wf in rows if not seen.contains(wf.id, wf.run_id)]
+        summary.skipped = len(rows) - len(kept)
+        rows = kept
+    # Shaped like the workflow's filter when it sent one, so the workflow can merge the result
+    closed = RunFilter(seen.bits, seen.hashes) if seen is not None else RunFilter(TERMINATED_FILTER_BITS, TERMINATED_FILTER_HASHES)
+    outcomes = await asyncio.gather(*(_terminate_once(wf.id, wf.run_id, summary, _workload(wf)) for wf in rows))
+    for wf, (outcome, status) in zip(rows, outcomes):
+        if outcome in (TERMINATED, ALREADY_CLOSED):
+            closed.add(wf.id, wf.run_id)
+        if outcome == TERMINATED:
+            summary.terminated += 1
+        elif outcome == ALREADY_CLOSED:
+            summary.already_closed += 1
+        else:
+            summary.failed += 1
+            status = status or "UNKNOWN"
+            summary.failed_by_status[status] = summary.failed_by_status.get(status, 0) + 1
+    result.closed = closed.dump() if closed.count else None
+    return result
+
+#This activity checks whether all activities have been canceled for a certain amount of time and returns the outcome.
+#It counts matching workflows instead of listing them and backs off exponentially while the count isn't dropping.
+@activity.defn
+async def confirm_all_canceled(target: str) -> ConfirmResult:
+    # Poll until there are no running workflows matching the target filter
+    # Give up after a timeout window, or early if the count stops dropping
     deadline_seconds = int(os.getenv("CONFIRM_TIMEOUT_SECONDS", "240"))
     poll_interval = float(os.getenv("CONFIRM_POLL_SECONDS", "5"))
+    max_interval = float(os.getenv("CONFIRM_MAX_POLL_SECONDS", "30"))
+    zero_streak = int(os.getenv("CONFIRM_ZERO_STREAK", "3"))  # consecutive zero counts to absorb visibility lag
+    stall_polls = int(os.getenv("CONFIRM_STALL_POLLS", "3"))  # polls without progress before handing back to the workflow
+
+    query = f'({target}) AND ExecutionStatus = "Running"'
+    deadline = time.monotonic() + deadline_seconds
+
+    details = activity.info().heartbeat_details
+    last: Optional[int] = details[0] if details else None
+    last_at: Optional[float] = None  # when last was counted; unknown for a count carried over in a heartbeat
+    interval = poll_interval
+    zeros = stalls = 0
+    while True:
+        async with COUNT_LIMITER.slot(), CLIENTS.lease() as client:
+            remaining = (await client.count_workflows(query)).count
+        counted_at = time.monotonic()
+        activity.heartbeat(remaining)
+
+        if remaining == 0:
+            zeros += 1
+            if zeros >= zero_streak:
+                return ConfirmResult(confirmed=True)
+            interval = poll_interval
+        elif last is None:
+            # First count: nothing to measure progress against yet
+            interval = poll_interval
+        elif remaining < last:
+            # Draining: poll again around when the current rate should reach zero. The rate is over the time
+            # between the counts, which includes the count calls themselves, not just the planned sleep.
+            zeros = stalls = 0
+            if last_at is None:
+                interval = poll_interval
+            else:
+                rate = (last - remaining) / (counted_at - last_at)
+                interval = min(max(remaining / rate, poll_interval), max_interval)
+        else:
+            # Stalled or growing: back off, and let the workflow re-terminate once it's clearly stuck
+            zeros = 0
+            stalls += 1
+            if stalls >= stall_polls:
+                return ConfirmResult(confirmed=False, remaining=remaining, stalled=True)
+            interval = min(interval * 2, max_interval)
+        last, last_at = remaining, counted_at
 
-    async def any_running() -> bool:
-        query = f"WorkloadId = {workload_id} and ExecutionStatus = 'Running'"
-        async for _ in client.list_workflows(query=query):
-            return True
-        return False
-
-    remaining = deadline_seconds
-    while remaining > 0:
-        if not await any_running():
-            return True
-        await asyncio.sleep(poll_interval)
-        remaining -= poll_interval
-    return False
+        time_left = deadline - time.monotonic()
+        if time_left <= 0:
+            return ConfirmResult(confirmed=False, remaining=remaining)
+        await asyncio.sleep(min(interval, time_left))
@@ -0,0 +1,300 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from temporalio import activity
+from temporalio.api.batch.v1 import BatchOperationCancellation, BatchOperationTermination
+from temporalio.api.workflowservice.v1 import StartBatchOperationRequest, DescribeBatchOperationRequest
+from temporalio.client import Client
+from temporalio.common import SearchAttributeKey, SearchAttributePair, TypedSearchAttributes
+from temporalio.exceptions import ApplicationError
+from temporalio.service import RPCError, RPCStatusCode
+from temporalio.testing import WorkflowEnvironment
+from temporalio.worker import Worker
+
+# End-to-end cancellation benchmark against a local dev server (WorkflowEnvironment.start_local).
+# For each strategy it starts a fresh dev server with WorkloadId registered, runs the work worker (src/work/worker.py)
+# in a subprocess, spawns a CancelableWorkflow tree, then runs BulkCancelWorkflow with an in-process canceler worker
+# and records how long it takes for nothing to be running. Results are one JSON document, so runs from two commits
+# can be diffed or compared by a script.
+#
+#   python bench_cancel.py --strategies batch-only,direct,hybrid --executions 20 --width 50 --output bench.json
+#
+# Strategies:
+#   batch-only  tree frozen and fully spawned, then the batch job; the cleanup passes find nothing new
+#   direct      tree frozen and fully spawned, then cleanup passes terminate everything (CANCEL_STRATEGY=direct)
+#   hybrid      canceler starts once --ready of the tree is running while the rest keeps spawning; the batch job
+#               covers what existed and cleanup passes terminate what starts after it
+#   tree        tree frozen and fully spawned, then CANCEL_STRATEGY=tree
+#
+# The Java batch worker isn't needed: batch_cancel_workflows on batch-queue is served by a Python stand-in here
+# that starts a single batch job (BATCH_PARTITIONS is ignored). Each strategy runs in its own process, so the
+# RPC counts and peak RSS cover that strategy's canceler worker only. Pass --dev-server-path to use a local
+# Temporal CLI binary instead of downloading one.
+
+WORK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "work")
+WORK_TASK_QUEUE = "bench-work-queue"
+CANCELER_TASK_QUEUE = "bench-canceler-queue"
+WORKLOAD_KEY = SearchAttributeKey.for_keyword("WorkloadId")
+
+# Benchmark strategy -> (BulkCancelWorkflow strategy, freeze the fully spawned tree before cancelling)
+STRATEGIES = {
+    "batch-only": ("batch", True),
+    "direct": ("direct", True),
+    "hybrid": ("batch", False),
+    "tree": ("tree", True),
+}
+
+
+class BatchStandIn:
+    """Serves batch_cancel_workflows on batch-queue in place of the Java worker and remembers the jobs it started."""
+
+    def __init__(self, client: Client):
+        self.client = client
+        self.job_ids: List[str] = []
+
+    @activity.defn(name="batch_cancel_workflows")
+    async def batch_cancel_workflows(self, target: str, terminate: bool, partitions: int, since: Optional[str],
+                                     bounds: Optional[List[str]] = None) -> List[str]:
+        info = activity.info()
+        # Same job ID and reason scheme as the Java activity: a retried attempt finds its job instead of starting another,
+        # and a job left by another run of the same workflow ID is an error rather than mistaken for ours
+        job_id = f"{info.workflow_id}-{info.workflow_run_id}-{info.activity_id}"
+        reason = f"Runaway Train: {info.workflow_id}/{info.workflow_run_id}"
+        request = StartBatchOperationRequest(
+            namespace=self.client.namespace,
+            visibility_query=f'({target}) AND ExecutionStatus = "Running"',
+            job_id=job_id,
+            reason=reason,
+        )
+        if terminate:
+            request.termination_operation.CopyFrom(BatchOperationTermination())
+        else:
+            request.cancellation_operation.CopyFrom(BatchOperationCancellation())
+        try:
+            await self.client.workflow_service.start_batch_operation(request)
+        except RPCError as err:
+            if err.status != RPCStatusCode.ALREADY_EXISTS:
+                raise
+            existing = await self.client.workflow_service.describe_batch_operation(
+                DescribeBatchOperationRequest(namespace=self.client.namespace, job_id=job_id)
+            )
+            if existing.reason != reason:
+                raise ApplicationError(f"batch job {job_id} already exists for another run: {existing.reason}", non_retryable=True)
+        if job_id not in self.job_ids:
+            self.job_ids.append(job_id)
+        return [job_id]
+
+    async def completed_operations(self) -> int:
+        total = 0
+        for job_id in self.job_ids:
+            response = await self.client.workflow_service.describe_batch_operation(
+                DescribeBatchOperationRequest(namespace=self.client.namespace, job_id=job_id)
+            )
+            total += response.complete_operation_count
+        return total
+
+
+def _tree_size(executions: int, width: int, depth: int) -> int:
+    # Root, its direct children, then width children per node for each further level
+    return 1 + sum(executions * width ** level for level in range(depth))
+
+
+async def _running(client: Client, query: str) -> int:
+    return (await client.count_workflows(query)).count
+
+
+async def _wait_quiescent(client: Client, query: str, deadline: float) -> Optional[float]:
+    """Return when the running count first hit zero, once a second zero confirms it, or None at the deadline."""
+    first_zero: Optional[float] = None
+    while time.monotonic() < deadline:
+        if await _running(client, query) == 0:
+            if first_zero is not None:
+                return first_zero
+            first_zero = time.monotonic()
+        else:
+            first_zero = None
+        await asyncio.sleep(0.5)
+    return None
+
+
+async def _history_events(client: Client, task_queue: str) -> Dict[str, int]:
+    """History events and executions (runs and shard children) of everything that ran on the canceler queue."""
+    events = runs = 0
+    async for wf in client.list_workflows(f'TaskQueue = "{task_queue}"'):
+        history = await client.get_workflow_handle(wf.id, run_id=wf.run_id).fetch_history()
+        events += len(history.events)
+        runs += 1
+    return {"history_events": events, "canceler_executions": runs}
+
+
+async def _run_strategy(name: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    strategy, freeze = STRATEGIES[name]
+    env = await WorkflowEnvironment.start_local(
+        search_attributes=[WORKLOAD_KEY],
+        dev_server_existing_path=options["dev_server_path"],
+    )
+    target = env.client.service_client.config.target_host
+    os.environ.update({
+        "TEMPORAL_TLS": "false",
+        "TEMPORAL_MAIN_ADDRESS": target,
+        "TEMPORAL_CANCELER_ADDRESS": target,
+        "TEMPORAL_MAIN_NAMESPACE": env.client.namespace,
+        "TEMPORAL_CANCELER_NAMESPACE": env.client.namespace,
+        "TEMPORAL_MAIN_TASK_QUEUE": WORK_TASK_QUEUE,
+        "TEMPORAL_CANCELER_TASK_QUEUE": CANCELER_TASK_QUEUE,
+    })
+    # The canceler modules read config on import, so they are imported once the environment points at the dev server
+    import worker as canceler_worker
+    from workflow import BulkCancelWorkflow, cancel_settings
+    from activity import TERMINATE_LIMITER, LIST_LIMITER, COUNT_LIMITER
+    from config import WORKLOAD_ID, POLL_INTERVAL, MAX_POLLS, SHARD_COUNT, TREE_DEPTH, LOCAL_ROUND_ROWS
+
+    work = subprocess.Popen([sys.executable, "worker.py"], cwd=WORK_DIR, env=dict(os.environ),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    canceler = asyncio.create_task(canceler_worker.run_worker(canceler_worker.ROLE_ALL))
+    batch = BatchStandIn(env.client)
+    client = env.client
+    running = f'WorkloadId = "{WORKLOAD_ID}" AND ExecutionStatus = "Running"'
+    deadline = time.monotonic() + options["timeout"]
+    result: Dict[str, Any] = {"strategy": name, "cancel_strategy": strategy, "frozen": freeze}
+    try:
+        async with Worker(client, task_queue="batch-queue", activities=[batch.batch_cancel_workflows]):
+            size = _tree_size(options["executions"], options["width"], options["depth"])
+            tree = await client.start_workflow(
+                "CancelableWorkflow",
+                args=[options["executions"], None, options["width"], options["depth"], options["concurrency"], True],
+                id="bench-tree",
+                task_queue=WORK_TASK_QUEUE,
+                search_attributes=TypedSearchAttributes([SearchAttributePair(WORKLOAD_KEY, str(WORKLOAD_ID))]),
+            )
+            spawn_start = time.monotonic()
+            ready = size if freeze else max(1, int(size * options["ready"]))
+            while (count := await _running(client, running)) < ready:
+                if work.poll() is not None:
+                    raise RuntimeError(f"work worker exited with code {work.returncode}")
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"tree reached {count}/{ready} running workflows before the timeout")
+                await asyncio.sleep(0.5)
+            result.update(tree_size=size, spawn_seconds=round(time.monotonic() - spawn_start, 3))
+            if freeze:
+                await tree.execute_update("freeze")
+            result["running_at_start"] = await _running(client, running)
+
+            canceler_client = await Client.connect(target, namespace=client.namespace, data_converter=canceler_worker.data_converter)
+            start = time.monotonic()
+            handle = await canceler_client.start_workflow(
+                BulkCancelWorkflow.run,
+                args=[WORKLOAD_ID, POLL_INTERVAL.total_seconds(), MAX_POLLS, SHARD_COUNT, strategy, TREE_DEPTH, LOCAL_ROUND_ROWS, None, cancel_settings()],
+                id="bench-canceler",
+                task_queue=CANCELER_TASK_QUEUE,
+            )
+            quiescent_at = await _wait_quiescent(client, running, deadline)
+            try:
+                outcome = await asyncio.wait_for(handle.result(), max(1.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                outcome = "timed out"
+            finished = time.monotonic()
+
+            elapsed = (quiescent_at or finished) - start
+            result.update(
+                quiescent=quiescent_at is not None,
+                time_to_quiescence_seconds=round(elapsed, 3) if quiescent_at is not None else None,
+                canceler_seconds=round(finished - start, 3),
+                canceler_result=outcome,
+                terminate_rpcs=TERMINATE_LIMITER.completed,
+                terminate_rpcs_per_second=round(TERMINATE_LIMITER.completed / elapsed, 1) if elapsed > 0 else None,
+                batch_terminated=await batch.completed_operations(),
+                visibility_queries=LIST_LIMITER.completed + COUNT_LIMITER.completed,
+                list_calls=LIST_LIMITER.completed,
+                count_calls=COUNT_LIMITER.completed,
+            )
+            result.update(await _history_events(client, CANCELER_TASK_QUEUE))
+    finally:
+        canceler_worker.interrupt_event.set()
+        await canceler
+        work.terminate()
+        work.wait()
+        await env.shutdown()
+    return result
+
+
+def _strategy_process(name: str, options: Dict[str, Any], conn: Any) -> None:
+    try:
+        result = asyncio.run(_run_strategy(name, options))
+    except Exception as err:
+        result = {"strategy": name, "error": f"{type(err).__name__}: {err}"}
+    # ru_maxrss is in KiB on Linux; the dev server and the work worker are separate processes and not counted
+    result["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    conn.send(result)
+    conn.close()
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare cancellation strategies against a local Temporal dev server")
+    parser.add_argument("--strategies", default="batch-only,direct,hybrid", help=f"comma-separated, from {', '.join(STRATEGIES)}")
+    parser.add_argument("--executions", type=int, default=20, help="direct children of the root")
+    parser.add_argument("--width", type=int, default=50, help="children per node below the root's children")
+    parser.add_argument("--depth", type=int, default=2, help="levels below the root")
+    parser.add_argument("--concurrency", type=int, default=100, help="child starts in flight per node")
+    parser.add_argument("--ready", type=float, default=0.5, help="fraction of the tree running before hybrid starts cancelling")
+    parser.add_argument("--timeout", type=float, default=600, help="seconds per strategy, spawning included")
+    parser.add_argument("--dev-server-path", default=None, help="existing Temporal CLI binary for the dev server")
+    parser.add_argument("--output", default=None, help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+    names = [n.strip() for n in args.strategies.split(",") if n.strip()]
+    unknown = [n for n in names if n not in STRATEGIES]
+    if unknown:
+        parser.error(f"unknown strategies: {', '.join(unknown)}")
+
+    options = {k: v for k, v in vars(args).items() if k not in ("strategies", "output")}
+    ctx = multiprocessing.get_context("spawn")
+    results: List[Dict[str, Any]] = []
+    for name in names:
+        receiver, sender = ctx.Pipe(duplex=False)
+        process = ctx.Process(target=_strategy_process, args=(name, options, sender), name=f"bench-{name}")
+        process.start()
+        sender.close()
+        try:
+            result = receiver.recv()
+        except EOFError:
+            result = {"strategy": name, "error": f"benchmark process exited with code {process.exitcode}"}
+        process.join()
+        results.append(result)
+        if "error" in result:
+            print(f"{name}: {result['error']}", file=sys.stderr)
+        else:
+            print(f"{name}: {result['time_to_quiescence_seconds']}s to quiescence, {result['terminate_rpcs']} terminate RPCs", file=sys.stderr)
+
+    report = {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "options": options,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 1 if any("error" in r for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
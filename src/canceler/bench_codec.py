@@ -0,0 +1,75 @@
+import argparse
+import asyncio
+import tempfile
+import time
+from typing import Awaitable, Callable, Iterable, List
+from temporalio.api.common.v1 import Payload
+from payload_manager import Codec
+
+# Microbenchmark for Codec.encode/decode on the common case: batches of small payloads that pass straight through.
+# "copy" is the previous behaviour (ByteSize() + Payload()/CopyFrom per payload), "current" is Codec as shipped.
+#
+#   python bench_codec.py --payloads 4 --rounds 20000
+
+
+async def copy_encode(codec: Codec, payloads: Iterable[Payload]) -> List[Payload]:
+    out: List[Payload] = []
+    for p in payloads:
+        if p.ByteSize() > codec.min_bytes:
+            out.append(await codec.encode_payload(p))
+        else:
+            new_payload = Payload()
+            new_payload.CopyFrom(p)
+            out.append(new_payload)
+    return out
+
+
+async def copy_decode(codec: Codec, payloads: Iterable[Payload]) -> List[Payload]:
+    out: List[Payload] = []
+    for p in payloads:
+        new_payload = Payload()
+        new_payload.CopyFrom(p)
+        out.append(new_payload)
+    return out
+
+
+def make_payloads(count: int, size: int) -> List[Payload]:
+    return [
+        Payload(metadata={"encoding": b"json/plain"}, data=b'"' + b"x" * max(0, size - 2) + b'"')
+        for _ in range(count)
+    ]
+
+
+async def measure(fn: Callable[[List[Payload]], Awaitable[List[Payload]]], payloads: List[Payload], rounds: int) -> float:
+    """Return nanoseconds per payload."""
+    await fn(payloads)  # warm up
+    start = time.perf_counter_ns()
+    for _ in range(rounds):
+        await fn(payloads)
+    return (time.perf_counter_ns() - start) / (rounds * len(payloads))
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Codec encode/decode microbenchmark")
+    parser.add_argument("--payloads", type=int, default=4, help="payloads per encode/decode call")
+    parser.add_argument("--size", type=int, default=2048, help="bytes of data per payload")
+    parser.add_argument("--rounds", type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as path:
+        codec = Codec(1_000_000, path + "/")
+        payloads = make_payloads(args.payloads, args.size)
+        encoded = await codec.encode(payloads)
+        cases = [
+            ("encode", lambda ps: copy_encode(codec, ps), codec.encode, payloads),
+            ("decode", lambda ps: copy_decode(codec, ps), codec.decode, encoded),
+        ]
+        print(f"{args.payloads} x {args.size}B payloads per call, {args.rounds} rounds")
+        for name, before, after, batch in cases:
+            old = await measure(before, batch, args.rounds)
+            new = await measure(after, batch, args.rounds)
+            print(f"{name}: copy {old:8.0f} ns/payload   current {new:8.0f} ns/payload   ({old / new:.1f}x)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
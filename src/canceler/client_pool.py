@@ -0,0 +1,84 @@
+from __future__ import annotations
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, List
+from temporalio.client import Client
+
+logger = logging.getLogger(__name__)
+
+
+class ClientPool:
+    """A fixed set of clients, each with its own gRPC channel, shared by every activity in the worker process.
+
+    One channel caps how many RPCs can be in flight at once (the server's HTTP/2 max concurrent streams), so
+    terminate and list throughput stop scaling with the limiters well before CANCEL_CONCURRENCY. Each lease
+    goes to the channel with the fewest calls in flight, rotating the starting point so ties spread evenly.
+    All channels are opened together on first use, under a lock so concurrent first callers share one connect.
+    """
+
+    def __init__(self, size: int, connect: Callable[[], Awaitable[Client]]):
+        self.size = max(1, size)
+        self._connect = connect
+        self._clients: List[Client] = []
+        self._in_flight: List[int] = []
+        self._next = 0
+        self._lock = asyncio.Lock()
+        self._closed = False
+        self._idle = asyncio.Event()  # set while no lease is open
+        self._idle.set()
+
+    @property
+    def in_flight(self) -> List[int]:
+        return list(self._in_flight)
+
+    async def _ensure(self) -> None:
+        if self._clients:
+            return
+        async with self._lock:
+            if self._closed:
+                raise RuntimeError("client pool is closed")
+            if not self._clients:
+                # All or nothing: a failed connect leaves the pool empty so the next caller tries again
+                clients = await asyncio.gather(*(self._connect() for _ in range(self.size)))
+                self._in_flight = [0] * len(clients)
+                self._clients = list(clients)
+                logger.info("Opened %d client channels", len(clients))
+
+    def _pick(self) -> int:
+        start = self._next
+        self._next = (start + 1) % len(self._clients)
+        best = start
+        for k in range(1, len(self._clients)):
+            j = (start + k) % len(self._clients)
+            if self._in_flight[j] < self._in_flight[best]:
+                best = j
+        return best
+
+    @asynccontextmanager
+    async def lease(self) -> AsyncIterator[Client]:
+        """Yield the least loaded client for the duration of one or a few RPCs."""
+        await self._ensure()
+        if self._closed:
+            raise RuntimeError("client pool is closed")
+        i = self._pick()
+        self._in_flight[i] += 1
+        self._idle.clear()
+        try:
+            yield self._clients[i]
+        finally:
+            self._in_flight[i] -= 1
+            if not any(self._in_flight):
+                self._idle.set()
+
+    async def close(self, timeout: float = 10.0) -> None:
+        """Stop handing out clients, wait up to timeout for leased calls to finish, then drop the channels."""
+        async with self._lock:
+            self._closed = True
+            try:
+                await asyncio.wait_for(self._idle.wait(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Closing client pool with %d calls still in flight", sum(self._in_flight))
+            # The SDK has no explicit close; a connection shuts down once nothing references its client
+            self._clients = []
+            self._in_flight = []
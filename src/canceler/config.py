@@ -15,6 +15,7 @@ TEMPORAL_MAIN_TASK_QUEUE=os.getenv('TEMPORAL_MAIN_TASK_QUEUE')
 TEMPORAL_CANCELER_TASK_QUEUE=os.getenv('TEMPORAL_CANCELER_TASK_QUEUE')
 TEMPORAL_MAIN_ADDRESS=os.getenv("TEMPORAL_MAIN_ADDRESS", "us-east-1.aws.api.temporal.io:7233")
 TEMPORAL_CANCELER_ADDRESS = os.getenv("TEMPORAL_CANCELER_ADDRESS", "us-east-1.aws.api.temporal.io:7233")
+TEMPORAL_TLS = os.getenv("TEMPORAL_TLS", "true").lower() == "true"  # false for a local dev server, e.g. bench_cancel.py
 
 #Target Jobs
 WORKLOAD_ID = 1 #Target search attribute value
@@ -25,6 +26,65 @@ CANCEL_TIMEOUT = timedelta(minutes=25)
 CONFIRM_TIMEOUT = timedelta(minutes=15)
 POLL_INTERVAL = timedelta(seconds=5)
 MAX_POLLS = 60  # upper bound to avoid infinite polling
+QUERY_HEARTBEAT_TIMEOUT = timedelta(seconds=60)
+CANCEL_HEARTBEAT_TIMEOUT = timedelta(seconds=60)
+TRACK_TIMEOUT = timedelta(minutes=5)
+TRACK_HEARTBEAT_TIMEOUT = timedelta(seconds=90)  # must exceed TRACK_MAX_POLL_SECONDS
+TRACK_WINDOW = timedelta(seconds=60)  # longest the tracker waits before handing back for a cleanup pass
+CONFIRM_HEARTBEAT_TIMEOUT = timedelta(seconds=90)  # must exceed CONFIRM_MAX_POLL_SECONDS
+
+# Paged listing defaults
+QUERY_PAGE_SIZE = int(os.getenv("QUERY_PAGE_SIZE", "1000"))  # rows per visibility page request
+QUERY_PAGE_ROWS = int(os.getenv("QUERY_PAGE_ROWS", "5000"))  # rows returned per paged activity result
+
+# Cancel strategy: "batch" starts the Java batch job and cleans up what it misses; "tree" terminates roots and
+# interior nodes and lets ParentClosePolicy.TERMINATE cascade to the leaves; "direct" skips the batch job and
+# terminates everything with cleanup passes
+STRATEGY_BATCH = "batch"
+STRATEGY_TREE = "tree"
+STRATEGY_DIRECT = "direct"
+CANCEL_STRATEGY = os.getenv("CANCEL_STRATEGY", STRATEGY_BATCH)
+BATCH_PARTITIONS = int(os.getenv("BATCH_PARTITIONS", "1"))  # parallel server-side batch jobs over disjoint StartTime ranges
+BATCH_TERMINATE = os.getenv("BATCH_TERMINATE", "true").lower() == "true"  # false requests cancellation instead
+TREE_DEPTH = int(os.getenv("TREE_DEPTH", "2"))  # levels terminated directly, counting roots as level 1
+TREE_MAX_LEVEL_IDS = int(os.getenv("TREE_MAX_LEVEL_IDS", "10000"))  # stop descending past a level this wide
+TREE_IN_CHUNK = 200  # parent IDs per ParentWorkflowId IN (...) query
+
+# Sharded termination: SHARD_COUNT=1 disables sharding, 0 sizes shards from a count of matching workflows
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "0"))
+MAX_SHARDS = int(os.getenv("MAX_SHARDS", "16"))
+ROWS_PER_SHARD = int(os.getenv("ROWS_PER_SHARD", "20000"))
+CHILD_SHARD_ROWS = int(os.getenv("CHILD_SHARD_ROWS", "200000"))  # above this many matches, shards run as child workflows
+
+# Final-phase fast path: passes expected to find at most this many stragglers run as one local activity (0 disables)
+LOCAL_ROUND_ROWS = int(os.getenv("LOCAL_ROUND_ROWS", "200"))
+LOCAL_ROUND_TIMEOUT = timedelta(seconds=30)
+
+# BulkCancelWorkflow continues as new between passes once the server suggests it or history reaches this many events
+CONTINUE_AS_NEW_EVENTS = int(os.getenv("CONTINUE_AS_NEW_EVENTS", "10000"))
+# ... or this many bytes. A pass that fills history part way hands the rest of its StartTime range to a CancelShardWorkflow child.
+CONTINUE_AS_NEW_BYTES = int(os.getenv("CONTINUE_AS_NEW_BYTES", str(8 * 1024 * 1024)))
+PHASE_BATCH = "batch"
+PHASE_CLEANUP = "cleanup"
+
+# Bloom filter of runs the canceler has already closed, so runs that visibility still lists as Running aren't terminated again.
+# 2**20 bits (128 KiB) with 5 hashes is under 1% false positives at 100k runs, and dumps to about 170 KB when full, so it
+# stays well inside a payload; it starts over past TERMINATED_FILTER_MAX_RUNS. TERMINATED_FILTER_BITS=0 turns it off.
+TERMINATED_FILTER_BITS = int(os.getenv("TERMINATED_FILTER_BITS", str(2**20)))
+TERMINATED_FILTER_HASHES = int(os.getenv("TERMINATED_FILTER_HASHES", "5"))
+TERMINATED_FILTER_MAX_RUNS = int(os.getenv("TERMINATED_FILTER_MAX_RUNS", "100000"))
+
+# Adaptive (AIMD) RPC concurrency; CANCEL_CONCURRENCY is the ceiling for terminates
+CANCEL_CONCURRENCY = int(os.getenv("CANCEL_CONCURRENCY", "750"))
+CANCEL_INITIAL_CONCURRENCY = int(os.getenv("CANCEL_INITIAL_CONCURRENCY", "100"))
+TERMINATE_P99_SECONDS = float(os.getenv("TERMINATE_P99_SECONDS", "1.0"))
+TERMINATE_MAX_ATTEMPTS = int(os.getenv("TERMINATE_MAX_ATTEMPTS", "5"))  # per ID, for retryable status codes
+TERMINATE_RETRY_BASE_SECONDS = float(os.getenv("TERMINATE_RETRY_BASE_SECONDS", "0.5"))
+TERMINATE_RETRY_MAX_SECONDS = float(os.getenv("TERMINATE_RETRY_MAX_SECONDS", "10"))
+VISIBILITY_CONCURRENCY = int(os.getenv("VISIBILITY_CONCURRENCY", "8"))  # ceiling for list/count calls per worker
+VISIBILITY_P99_SECONDS = float(os.getenv("VISIBILITY_P99_SECONDS", "5.0"))
+# gRPC channels to the main namespace per worker; each one caps in-flight RPCs at the server's HTTP/2 stream limit
+CLIENT_POOL_SIZE = int(os.getenv("CLIENT_POOL_SIZE", "4"))
 
 # Conservative retries; let StartToClose be the ultimate bound.
 DEFAULT_RETRY = RetryPolicy(
@@ -33,3 +93,28 @@ DEFAULT_RETRY = RetryPolicy(
     backoff_coefficient=2.0,
     maximum_attempts=0,  # unlimited attempts until StartToClose
 )
+
+# Oversize payload storage (/tmp/payloads)
+PAYLOAD_CACHE_BYTES = int(os.getenv("PAYLOAD_CACHE_BYTES", str(256 * 1024 * 1024)))  # in-memory decode cache budget
+PAYLOAD_MAX_AGE = timedelta(days=int(os.getenv("PAYLOAD_MAX_AGE_DAYS", "7")))  # keep above canceler workflow retention
+PAYLOAD_MAX_BYTES = int(os.getenv("PAYLOAD_MAX_BYTES", str(10 * 1024 ** 3)))  # on-disk budget
+PAYLOAD_JANITOR_INTERVAL = timedelta(minutes=10)
+
+# Worker processes (launcher.py). Each role gets its own slots and pollers; worker.py alone runs both roles in one process.
+ACTIVITY_PROCESSES = int(os.getenv("ACTIVITY_PROCESSES", str(max(1, (os.cpu_count() or 2) - 1))))
+ACTIVITY_CONCURRENCY = int(os.getenv("ACTIVITY_CONCURRENCY", "100"))  # activity slots per process
+ACTIVITY_TASK_POLLS = int(os.getenv("ACTIVITY_TASK_POLLS", "5"))
+# Resource-based activity slots instead of a fixed ACTIVITY_CONCURRENCY when set, e.g. 0.8 (fractions of the box)
+ACTIVITY_TARGET_CPU = float(os.getenv("ACTIVITY_TARGET_CPU", "0"))
+ACTIVITY_TARGET_MEMORY = float(os.getenv("ACTIVITY_TARGET_MEMORY", "0.8"))
+WORKFLOW_TASK_CONCURRENCY = int(os.getenv("WORKFLOW_TASK_CONCURRENCY", "1000"))
+WORKFLOW_TASK_POLLS = int(os.getenv("WORKFLOW_TASK_POLLS", "10"))
+WORKER_SHUTDOWN_TIMEOUT = timedelta(seconds=int(os.getenv("WORKER_SHUTDOWN_SECONDS", "30")))  # in-flight activities get this long to finish
+
+# Telemetry: SDK and canceler metrics go to a Prometheus scrape endpoint or, if that's unset, an OTLP collector
+CANCELER_PROMETHEUS_ADDRESS = os.getenv("CANCELER_PROMETHEUS_ADDRESS")  # e.g. 0.0.0.0:9464; launcher processes add their index to the port
+OTEL_METRICS_URL = os.getenv("OTEL_METRICS_URL")  # e.g. http://localhost:4317
+TRACING = os.getenv("TRACING", "false").lower() == "true"  # OpenTelemetry spans, needs temporalio[opentelemetry]
+LOG_LEVEL = os.getenv("LOG_LEVEL", "info")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # "json" for one structured object per line
+LOG_SAMPLE_ROWS = int(os.getenv("LOG_SAMPLE_ROWS", "1000"))  # log one listed / terminated workflow in this many (0 disables)
@@ -0,0 +1,52 @@
+import argparse
+import asyncio
+import dataclasses
+import json
+from temporalio.client import Client
+from workflow import BulkCancelWorkflow
+from config import TEMPORAL_CANCELER_ADDRESS, TEMPORAL_CANCELER_NAMESPACE, TEMPORAL_CANCELER_API_KEY, TEMPORAL_TLS
+
+#Use this script to watch or tune a running cancel without any visibility calls:
+#   python control.py progress
+#   python control.py concurrency 200 [--shards 8]
+#   python control.py poll-interval 10
+#   python control.py strategy direct
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Query or tune a running BulkCancelWorkflow")
+    parser.add_argument("--workflow-id", default="canceler-workflow")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("progress", help="print progress as JSON")
+    concurrency = commands.add_parser("concurrency", help="terminate calls in flight per activity (0 = worker default)")
+    concurrency.add_argument("value", type=int)
+    concurrency.add_argument("--shards", type=int, default=None, help="shard count for later passes (0 = auto)")
+    poll = commands.add_parser("poll-interval", help="seconds between confirm attempts")
+    poll.add_argument("seconds", type=float)
+    strategy = commands.add_parser("strategy", help="switch strategy at the next pass boundary")
+    strategy.add_argument("name", choices=["batch", "tree", "direct"])
+    args = parser.parse_args()
+
+    # Connect to Temporal server
+    client = await Client.connect(
+        TEMPORAL_CANCELER_ADDRESS,
+        namespace=TEMPORAL_CANCELER_NAMESPACE,
+        api_key=TEMPORAL_CANCELER_API_KEY,
+        tls=TEMPORAL_TLS,
+    )
+    handle = client.get_workflow_handle_for(BulkCancelWorkflow.run, args.workflow_id)
+
+    if args.command == "progress":
+        progress = await handle.query(BulkCancelWorkflow.progress)
+        print(json.dumps(dataclasses.asdict(progress), indent=2))
+    elif args.command == "concurrency":
+        previous = await handle.execute_update(BulkCancelWorkflow.set_concurrency, args=[args.value, args.shards])
+        print(f"Concurrency set to {args.value} (was {previous})")
+    elif args.command == "poll-interval":
+        previous_seconds = await handle.execute_update(BulkCancelWorkflow.set_poll_interval, args.seconds)
+        print(f"Poll interval set to {args.seconds}s (was {previous_seconds}s)")
+    else:
+        previous_strategy = await handle.execute_update(BulkCancelWorkflow.set_strategy, args.name)
+        print(f"Switching from {previous_strategy} to {args.name} at the next pass")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
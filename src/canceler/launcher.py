@@ -0,0 +1,80 @@
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import signal
+import sys
+import time
+from multiprocessing.connection import wait
+from typing import List
+from config import ACTIVITY_PROCESSES, WORKER_SHUTDOWN_TIMEOUT
+from worker import ROLE_ACTIVITY, ROLE_WORKFLOW, run_worker
+
+# Runs the canceler as one workflow-only worker process plus N activity-only worker processes, all polling
+# canceler-task-queue. Terminate fan-out then gets its own cores instead of sharing an event loop with workflow tasks.
+#
+#   python launcher.py --activity-processes 7
+#
+# SIGINT/SIGTERM are passed to every worker, which stops polling and lets in-flight tasks finish. Workers still
+# running WORKER_SHUTDOWN_SECONDS (+10s) later are killed. If any worker exits on its own the rest are stopped too,
+# so a supervisor (systemd, Kubernetes) can restart the whole group. With CANCELER_PROMETHEUS_ADDRESS set, the workflow
+# process serves metrics on that port and activity process i on port + i.
+
+logger = logging.getLogger("launcher")
+
+def _run(role: str, index: int) -> None:
+    try:
+        asyncio.run(run_worker(role, index))
+    except KeyboardInterrupt:
+        # Interrupted before the worker installed its own signal handlers
+        pass
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Start the canceler workflow worker and activity worker processes")
+    parser.add_argument("--activity-processes", type=int, default=ACTIVITY_PROCESSES)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(processName)s %(message)s")
+
+    # spawn: each worker gets a fresh interpreter rather than a fork of this one
+    ctx = multiprocessing.get_context("spawn")
+    processes: List[multiprocessing.process.BaseProcess] = [ctx.Process(target=_run, args=(ROLE_WORKFLOW, 0), name="canceler-workflow")]
+    processes += [
+        ctx.Process(target=_run, args=(ROLE_ACTIVITY, i), name=f"canceler-activity-{i}")
+        for i in range(1, max(1, args.activity_processes) + 1)
+    ]
+
+    stopping = False
+    def stop(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for process in processes:
+        process.start()
+    logger.info("Started 1 workflow worker and %d activity workers", len(processes) - 1)
+
+    exit_code = 0
+    while not stopping:
+        wait([p.sentinel for p in processes], timeout=1)
+        exited = [p for p in processes if not p.is_alive()]
+        if exited:
+            for p in exited:
+                logger.error("%s exited with code %s, stopping the others", p.name, p.exitcode)
+            exit_code = 1
+            break
+
+    for process in processes:
+        if process.is_alive():
+            process.terminate()  # SIGTERM: graceful worker shutdown
+    deadline = time.monotonic() + WORKER_SHUTDOWN_TIMEOUT.total_seconds() + 10
+    for process in processes:
+        process.join(max(0.0, deadline - time.monotonic()))
+        if process.is_alive():
+            logger.warning("%s did not stop in time, killing it", process.name)
+            process.kill()
+            process.join()
+    return exit_code
+
+if __name__ == "__main__":
+    sys.exit(main())
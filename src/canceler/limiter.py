@@ -0,0 +1,158 @@
+from __future__ import annotations
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict
+from temporalio.service import RPCError, RPCStatusCode
+from telemetry import metrics
+
+logger = logging.getLogger(__name__)
+
+# Status codes that mean the server wants us to slow down
+THROTTLE_CODES = frozenset({
+    RPCStatusCode.RESOURCE_EXHAUSTED,
+    RPCStatusCode.UNAVAILABLE,
+    RPCStatusCode.DEADLINE_EXCEEDED,
+})
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit for a class of RPCs, shared by every activity in the worker process.
+
+    Each healthy call grows the limit by increase/limit (about +increase per round of calls). A throttling
+    status code, or a windowed p99 latency above target, multiplies it by backoff at most once per cooldown.
+    The SDK retries throttled calls internally before raising, so latency is often the first sign of pushback.
+
+    Callers queue per key (the canceler uses the WorkloadId) and freed slots go round-robin across keys,
+    so one large workload can't starve the others sharing the budget.
+    """
+
+    def __init__(self, name: str, initial: int, maximum: int, p99_target: float, minimum: int = 1,
+                 increase: float = 1.0, backoff: float = 0.5, window: int = 200, cooldown: float = 1.0):
+        self.name = name
+        self.limit = float(max(minimum, min(initial, maximum)))
+        self.maximum = maximum
+        self.minimum = minimum
+        self.p99_target = p99_target
+        self.increase = increase
+        self.backoff = backoff
+        self.window = window
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._completed = 0
+        self._last_decrease = 0.0
+        self._waiters: Dict[str, Deque[asyncio.Future[None]]] = {}
+        self._turns: Deque[str] = deque()  # keys with queued callers, in the order they get the next slot
+        self._attributes = {"limiter": name}
+
+    @property
+    def completed(self) -> int:
+        """Calls made through this limiter since the process started."""
+        return self._completed
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for queue in self._waiters.values() for w in queue if not w.done())
+
+    def p99(self) -> float:
+        if not self._latencies:
+            return 0.0
+        ordered = sorted(self._latencies)
+        return ordered[int(0.99 * (len(ordered) - 1))]
+
+    @asynccontextmanager
+    async def slot(self, key: str = "") -> AsyncIterator[None]:
+        """Hold one unit of concurrency for the duration of an RPC and feed its outcome back into the limit.
+        While the limit is reached, callers wait in key's queue."""
+        await self._acquire(key)
+        start = time.monotonic()
+        throttled = False
+        try:
+            yield
+        except RPCError as err:
+            throttled = err.status in THROTTLE_CODES
+            raise
+        finally:
+            self._release(time.monotonic() - start, throttled)
+
+    async def _acquire(self, key: str) -> None:
+        # Queue behind anyone already waiting, or a caller that just released could take its slot straight back
+        if self.in_flight < int(self.limit) and not self._turns:
+            self.in_flight += 1
+            self._report()
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        if key not in self._waiters:
+            self._waiters[key] = deque()
+            self._turns.append(key)
+        self._waiters[key].append(waiter)
+        self._wake()
+        self._report()
+        try:
+            # _wake hands the slot over along with the wakeup, so there's nothing to re-check
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.cancelled():
+                self._forget(key, waiter)
+            else:
+                # Pass on a slot we were handed but can no longer use
+                self.in_flight -= 1
+            self._wake()
+            self._report()
+            raise
+
+    def _forget(self, key: str, waiter: asyncio.Future[None]) -> None:
+        queue = self._waiters.get(key)
+        if queue is None or waiter not in queue:
+            return
+        queue.remove(waiter)
+        if not queue:
+            del self._waiters[key]
+            self._turns.remove(key)
+
+    def _release(self, latency: float, throttled: bool) -> None:
+        self.in_flight -= 1
+        self._latencies.append(latency)
+        self._completed += 1
+        if throttled:
+            self._decrease("throttled by server")
+        elif self._completed % self.window == 0 and self.p99() > self.p99_target:
+            self._decrease(f"p99 {self.p99():.3f}s over {self.p99_target:.3f}s target")
+        else:
+            self.limit = min(float(self.maximum), self.limit + self.increase / self.limit)
+        self._wake()
+        self._report()
+
+    def _report(self) -> None:
+        m = metrics()
+        m.limiter_waiting.set(sum(len(queue) for queue in self._waiters.values()), self._attributes)
+        m.limiter_in_flight.set(self.in_flight, self._attributes)
+        m.limiter_limit.set(int(self.limit), self._attributes)
+
+    def _decrease(self, reason: str) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self.limit = max(float(self.minimum), self.limit * self.backoff)
+        logger.warning("%s limit lowered to %d: %s", self.name, int(self.limit), reason)
+
+    def _wake(self) -> None:
+        # One waiter per key per turn; a key leaves the rotation once its queue is empty. Each woken waiter
+        # is handed its slot here, before any new caller can claim it.
+        free = int(self.limit) - self.in_flight
+        while free > 0 and self._turns:
+            key = self._turns.popleft()
+            queue = self._waiters[key]
+            waiter = queue.popleft()
+            if queue:
+                self._turns.append(key)
+            else:
+                del self._waiters[key]
+            if not waiter.done():
+                waiter.set_result(None)
+                self.in_flight += 1
+                free -= 1
@@ -0,0 +1,220 @@
+from __future__ import annotations
+import base64
+import bisect
+import hashlib
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Union
+
+# Shared activity inputs/outputs. Kept free of client imports so the workflow sandbox can load them.
+
+EPOCH = "1970-01-01T00:00:00.000Z"  # StartTime lower bound that matches everything
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)  # bucket upper bounds; one extra overflow bucket
+
+def visibility_time(dt: datetime) -> str:
+    # Millisecond UTC timestamp as used in StartTime visibility filters; sorts lexically
+    return dt.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+def parse_visibility_time(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+# What BulkCancelWorkflow targets: one WorkloadId (an int or a digit-only string), a list of them, or any visibility filter as a string.
+# str comes before List so the JSON converter doesn't decode a filter into a list of characters.
+Workloads = Union[int, str, List[Union[int, str]]]
+
+def workload_filter(workloads: Workloads) -> str:
+    # The visibility clause every canceler listing, count and batch job ANDs its own conditions onto
+    if isinstance(workloads, list):
+        if not workloads:
+            raise ValueError("no workload IDs given")
+        if len(workloads) == 1:
+            return f'WorkloadId = "{workloads[0]}"'
+        return "WorkloadId IN (" + ", ".join(f'"{w}"' for w in workloads) + ")"
+    if isinstance(workloads, int):
+        return f'WorkloadId = "{workloads}"'
+    if not workloads.strip():
+        raise ValueError("empty visibility filter")
+    if workloads.strip().isdigit():
+        # "1" is a WorkloadId, not the query `1`; anything else is a filter
+        return f'WorkloadId = "{workloads.strip()}"'
+    return workloads
+
+class RunFilter:
+    """Bloom filter of (workflow ID, run ID) pairs, used for runs the canceler has already closed.
+
+    Fixed size whatever the number of runs added, and no false negatives. A false positive skips a live run, so callers
+    need a way to start over (BulkCancelWorkflow does when a confirm stalls). dump() is zlib-compressed, so a mostly
+    empty filter costs a few KB in a payload. bits=0 gives a filter that is always empty.
+    """
+
+    def __init__(self, bits: int, hashes: int, data: Optional[bytearray] = None, count: int = 0):
+        self.bits = bits
+        self.hashes = hashes
+        self.data = data if data is not None else bytearray((bits + 7) // 8)
+        self.count = count  # runs added, including through union(); an upper bound when the same run is added twice
+
+    def _positions(self, workflow_id: str, run_id: Optional[str]) -> List[int]:
+        # Double hashing: position i is h1 + i*h2, from one 128-bit digest
+        digest = hashlib.blake2b(f"{workflow_id}/{run_id or ''}".encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def add(self, workflow_id: str, run_id: Optional[str]) -> None:
+        if not self.bits:
+            return
+        for pos in self._positions(workflow_id, run_id):
+            self.data[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def contains(self, workflow_id: str, run_id: Optional[str]) -> bool:
+        return bool(self.bits) and all(self.data[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(workflow_id, run_id))
+
+    def union(self, other: RunFilter) -> None:
+        # Filters of a different shape (config changed between runs) can't be merged; their runs just get listed again
+        if (other.bits, other.hashes) != (self.bits, self.hashes) or not other.count:
+            return
+        merged = int.from_bytes(self.data, "little") | int.from_bytes(other.data, "little")
+        self.data = bytearray(merged.to_bytes(len(self.data), "little"))
+        self.count += other.count
+
+    def dump(self) -> str:
+        return f"{self.bits}:{self.hashes}:{self.count}:" + base64.b64encode(zlib.compress(bytes(self.data))).decode("ascii")
+
+    @classmethod
+    def load(cls, value: str) -> RunFilter:
+        bits, hashes, count, data = value.split(":", 3)
+        return cls(int(bits), int(hashes), bytearray(zlib.decompress(base64.b64decode(data))), int(count))
+
+@dataclass
+class WorkflowPage:
+    """One page of running workflow executions returned by query_wf_executions_page."""
+    workflow_ids: List[str] = field(default_factory=list)
+    run_ids: List[str] = field(default_factory=list)  # parallel to workflow_ids
+    workloads: List[str] = field(default_factory=list)  # WorkloadId of each row, parallel to workflow_ids; "" if unset
+    next_page_token: Optional[str] = None  # base64 visibility token; None once the listing is exhausted
+    latest_start_time: Optional[str] = None  # newest StartTime on the page, see visibility_time
+    latest_ids: List[str] = field(default_factory=list)  # IDs started at exactly latest_start_time
+
+@dataclass
+class ConfirmResult:
+    """Outcome of confirm_all_canceled."""
+    confirmed: bool
+    remaining: int = 0  # last running count observed
+    stalled: bool = False  # count stopped dropping; worth re-running a targeted termination
+
+@dataclass
+class TerminateSummary:
+    """Outcome counts and terminate latency histograms returned by bulk_cancel_workflows."""
+    terminated: int = 0
+    already_closed: int = 0  # NotFound / already completed; as good as terminated
+    failed: int = 0  # non-retryable errors, or retryable ones that ran out of attempts
+    retries: int = 0  # extra terminate attempts issued after retryable errors
+    skipped: int = 0  # listed runs left alone because the canceler had already closed them; not part of done
+    failed_by_status: Dict[str, int] = field(default_factory=dict)
+    latency_ms: Dict[str, List[int]] = field(default_factory=dict)  # outcome -> counts per LATENCY_BUCKETS_MS bucket
+
+    @property
+    def done(self) -> int:
+        return self.terminated + self.already_closed
+
+    def observe(self, outcome: str, seconds: float) -> None:
+        buckets = self.latency_ms.setdefault(outcome, [0] * (len(LATENCY_BUCKETS_MS) + 1))
+        buckets[bisect.bisect_left(LATENCY_BUCKETS_MS, seconds * 1000)] += 1
+
+    def merge(self, other: TerminateSummary) -> TerminateSummary:
+        self.terminated += other.terminated
+        self.already_closed += other.already_closed
+        self.failed += other.failed
+        self.retries += other.retries
+        self.skipped += other.skipped
+        for status, n in other.failed_by_status.items():
+            self.failed_by_status[status] = self.failed_by_status.get(status, 0) + n
+        for outcome, counts in other.latency_ms.items():
+            mine = self.latency_ms.setdefault(outcome, [0] * len(counts))
+            for b, n in enumerate(counts):
+                mine[b] += n
+        return self
+
+@dataclass
+class ShardResult:
+    """Outcome of terminating one StartTime range, plus the newest StartTime it listed."""
+    summary: TerminateSummary = field(default_factory=TerminateSummary)
+    latest_start_time: Optional[str] = None
+    latest_ids: List[str] = field(default_factory=list)
+    workflow_ids: List[str] = field(default_factory=list)  # only filled when the caller asks to collect them
+    truncated: bool = False  # terminate_stragglers hit its row limit; more may match
+    closed: Optional[str] = None  # RunFilter.dump() of the runs this shard closed, for the parent to merge
+    next_page_token: Optional[str] = None  # listing stopped here because history was full; the rest of the range is left
+
+@dataclass
+class BatchProgress:
+    """Combined progress of the server-side batch jobs, as reported by track_batch."""
+    completed: int = 0
+    failed: int = 0
+    total: int = 0
+    done: bool = False  # every job has left the running state
+    failed_jobs: List[str] = field(default_factory=list)
+
+@dataclass
+class CancelSettings:
+    """Tuning that BulkCancelWorkflow branches on. It is a run argument, carried through continue-as-new, so every
+    worker replays a run the same way whatever its environment; workflow.cancel_settings() reads it from config.py."""
+    max_shards: int = 16
+    rows_per_shard: int = 20000
+    child_shard_rows: int = 200000  # above this many matches, shards run as child workflows
+    tree_max_level_ids: int = 10000
+    batch_partitions: int = 1
+    batch_terminate: bool = True
+    continue_as_new_events: int = 10000
+    continue_as_new_bytes: int = 8 * 1024 * 1024
+    filter_bits: int = 2**20  # RunFilter shape; 0 turns the filter off
+    filter_hashes: int = 5
+    filter_max_runs: int = 100000
+
+@dataclass
+class BulkCancelState:
+    """What BulkCancelWorkflow carries across continue-as-new."""
+    phase: str  # PHASE_BATCH while the batch job(s) run, then PHASE_CLEANUP
+    sweep_from: str
+    watermark: Optional[str] = None
+    watermark_ids: List[str] = field(default_factory=list)
+    passes: int = 0
+    attempt: int = 0  # cleanup attempts already made in the current round of MAX_POLLS
+    last_pass_rows: Optional[int] = None
+    expected_rows: Optional[int] = None
+    batch_job_ids: List[str] = field(default_factory=list)
+    totals: TerminateSummary = field(default_factory=TerminateSummary)
+    runs: int = 1  # workflow runs so far, including this one
+    started_at: Optional[str] = None  # when the first run started, see visibility_time
+    last_remaining: Optional[int] = None  # running count from the last confirm
+    concurrency: int = 0  # terminate calls in flight per activity, set by update; 0 = the worker's CANCEL_CONCURRENCY
+    switch_to: Optional[str] = None  # strategy requested by update, applied at the next pass boundary
+    closed_runs: Optional[str] = None  # RunFilter.dump() of runs already closed, skipped when listed again
+
+@dataclass
+class CancelProgress:
+    """In-memory progress of a BulkCancelWorkflow, returned by its progress query at no visibility cost."""
+    phase: str
+    strategy: str
+    fully_canceled: bool
+    runs: int
+    passes: int
+    attempt: int
+    batch_job_ids: List[str]
+    batch_progress: Optional[BatchProgress]
+    terminated: int
+    already_closed: int
+    failed: int
+    retries: int
+    skipped: int  # listed runs not terminated again because they were already closed
+    last_pass_rows: Optional[int]
+    last_remaining: Optional[int]  # running count from the last confirm
+    elapsed_seconds: float
+    throughput: float  # workflows handled by the canceler per second since the cancel started
+    last_pass_throughput: Optional[float]
+    concurrency: int
+    shard_count: int
+    poll_interval_seconds: float
+    pending_strategy: Optional[str] = None
+    target: str = ""  # visibility clause the cancel lists and counts, see workload_filter
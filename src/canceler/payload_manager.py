@@ -1,53 +1,109 @@
-import uuid
-from typing import Iterable, List
+import asyncio
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Tuple
 from temporalio.api.common.v1 import Payload
 from temporalio.converter import PayloadCodec
+from payload_store import PayloadStore
+from telemetry import metrics
+
+CODEC_KEY = "temporal.io/oversize-payload-codec"
+METADATA_ALLOWANCE = 4096  # generous per-payload bound on metadata + framing bytes; real payloads carry a few dozen
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as file:
+        return file.read()
+
+class DecodeCache:
+    """LRU of decoded oversize payloads bounded by their total serialized size.
+
+    Replays decode the same large payloads over and over; this keeps them in memory instead of going back to disk.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Payload, int]]" = OrderedDict()
+
+    def get(self, key: Tuple[str, str]) -> Optional[Payload]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key: Tuple[str, str], payload: Payload, size: int) -> None:
+        if size > self.max_bytes or key in self._entries:
+            return
+        self._entries[key] = (payload, size)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.bytes -= evicted
 
 class Codec(PayloadCodec):
 
     min_bytes = 1000000  # 1MB default
 
-    def __init__(self, min_bytes: int, path: str, ):
+    def __init__(self, min_bytes: int, path: str, store: Optional[PayloadStore] = None, cache_bytes: int = 256_000_000):
         self.min_bytes = min_bytes
         self.path = path
+        self.store = store or PayloadStore(path)
+        self.cache = DecodeCache(cache_bytes)
 
     async def encode(self, payloads: Iterable[Payload]) -> List[Payload]:
-        out: List[Payload] = []
-        for p in payloads:
-            if p.ByteSize() > self.min_bytes:
-                encoded = await self.encode_payload(p)
-                out.append(encoded)
-            else:
-                new_payload = Payload()
-                new_payload.CopyFrom(p)
-                out.append(new_payload)
-
+        # The SDK clears the container it passed in before adding our result, so always hand back a new list.
+        # Payloads under min_bytes go back as the same objects; copying them would buy nothing.
+        out = list(payloads)
+        if sum(len(p.data) for p in out) + METADATA_ALLOWANCE * len(out) <= self.min_bytes:
+            return out
+        for i, p in enumerate(out):
+            # data dominates a payload's size, so only pay for the exact ByteSize() walk near the threshold
+            if len(p.data) + METADATA_ALLOWANCE > self.min_bytes and p.ByteSize() > self.min_bytes:
+                out[i] = await self.encode_payload(p)
         return out
 
     async def decode(self, payloads: Iterable[Payload]) -> List[Payload]:
+        payloads = list(payloads)
+        if not any(CODEC_KEY in p.metadata for p in payloads):
+            return payloads
         out: List[Payload] = []
         for p in payloads:
-            if p.metadata.get("temporal.io/oversize-payload-codec", b"").decode() != "v1":
-                new_payload = Payload()
-                new_payload.CopyFrom(p)
-                out.append(new_payload)
+            version = p.metadata.get(CODEC_KEY, b"").decode()
+            if version == "v2":
+                key = (p.data.decode("utf-8"), p.metadata["compression"].decode())
+                payload = self.cache.get(key)
+                if payload is None:
+                    content = await self.store.get(*key)
+                    payload = Payload.FromString(content)
+                    self.cache.put(key, payload, len(content))
+                out.append(payload)
                 continue
+            if version != "v1":
+                out.append(p)
+                continue
+            # v1: uncompressed blob under a random key, written before the content-addressed store existed
             file_key = p.data.decode("utf-8")
-            with open(f"{self.path}{file_key}.txt", "rb") as file:
-                content = file.read()
-                payload = Payload.FromString(content)
-                out.append(payload)
+            content = await asyncio.to_thread(_read_file, f"{self.path}{file_key}.txt")
+            payload = Payload.FromString(content)
+            out.append(payload)
         return out
 
     async def encode_payload(self, payload: Payload) -> Payload:
-        file_key = str(uuid.uuid4())
-        with open(f"{self.path}{file_key}.txt", "wb") as new_file:
-            new_file.write(payload.SerializeToString())
+        data = payload.SerializeToString()
+        file_key, compression = await self.store.put(data)
+        m = metrics()
+        m.codec_offloaded_bytes.add(len(data))
+        m.codec_offloaded_payloads.add(1)
         out = Payload(
             metadata={
                 "encoding": b"binary/oversize-payload-codec",
-                "temporal.io/oversize-payload-codec": b"v1",
+                CODEC_KEY: b"v2",
+                "compression": compression.encode("utf-8"),
             },
             data=file_key.encode("utf-8"),
         )
-        return out
\ No newline at end of file
+        return out
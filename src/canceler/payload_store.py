@@ -0,0 +1,132 @@
+from __future__ import annotations
+import asyncio
+import hashlib
+import logging
+import mmap
+import os
+import tempfile
+import time
+import zlib
+from typing import Callable, Dict, Tuple, Union
+
+try:
+    import zstandard  # optional: pip install zstandard
+except ImportError:  # pragma: no cover - depends on the environment
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Decompressors also take the mmap of a stored blob, so reads don't copy the file first
+Blob = Union[bytes, mmap.mmap]
+Codec = Tuple[Callable[[bytes], bytes], Callable[[Blob], bytes]]
+
+
+def _compressors(level: int) -> Dict[str, Codec]:
+    out: Dict[str, Codec] = {
+        "none": (bytes, bytes),
+        "zlib": (lambda b: zlib.compress(b, level), zlib.decompress),
+    }
+    if zstandard is not None:
+        # zstandard (de)compressor objects aren't thread-safe, so make one per call
+        out["zstd"] = (
+            lambda b: zstandard.ZstdCompressor(level=level).compress(b),
+            lambda b: zstandard.ZstdDecompressor().decompress(b),
+        )
+    return out
+
+
+class PayloadStore:
+    """Content-addressed, compressed blob store for oversize payloads.
+
+    Blobs are named after the SHA-256 of their uncompressed bytes, so identical payloads (e.g. the same ID
+    list re-sent by a retried activity) are written once. All file I/O runs in a worker thread to keep the
+    event loop free, and reads can go through mmap to skip copying the file into a read buffer.
+    """
+
+    def __init__(self, path: str, compression: str = "zlib", level: int = 3, use_mmap: bool = True):
+        self.path = path
+        self.use_mmap = use_mmap
+        self._codecs = _compressors(level)
+        if compression not in self._codecs:
+            # zstd without the zstandard package installed
+            compression = "zlib"
+        self.compression = compression
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, key: str, compression: str) -> str:
+        return os.path.join(self.path, f"{key}.{compression}")
+
+    async def put(self, data: bytes) -> Tuple[str, str]:
+        """Store data and return its (key, compression)."""
+        return await asyncio.to_thread(self._put, data)
+
+    async def get(self, key: str, compression: str) -> bytes:
+        return await asyncio.to_thread(self._get, key, compression)
+
+    def _put(self, data: bytes) -> Tuple[str, str]:
+        key = hashlib.sha256(data).hexdigest()
+        target = self._file(key, self.compression)
+        if os.path.exists(target):
+            # Refresh mtime so the janitor treats it as recently used
+            os.utime(target)
+        else:
+            compressed = self._codecs[self.compression][0](data)
+            # Write to a temp file and rename so readers never see a partial blob
+            fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(compressed)
+                os.replace(tmp, target)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        return key, self.compression
+
+    def _get(self, key: str, compression: str) -> bytes:
+        decompress = self._codecs[compression][1]
+        target = self._file(key, compression)
+        os.utime(target)
+        with open(target, "rb") as f:
+            if not self.use_mmap or os.fstat(f.fileno()).st_size == 0:
+                return decompress(f.read())
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                return decompress(m)
+
+    def sweep(self, max_age_seconds: float, max_total_bytes: int) -> Tuple[int, int]:
+        """Delete blobs unused for max_age_seconds, then the least recently used ones until the directory fits
+        in max_total_bytes. Returns (files removed, bytes freed).
+
+        Workflows whose history still points at a removed blob can no longer be replayed, so keep max_age
+        above the retention period of canceler workflows.
+        """
+        now = time.time()
+        entries = []
+        with os.scandir(self.path) as it:
+            for entry in it:
+                if entry.is_file():
+                    st = entry.stat()
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        removed = freed = 0
+        for mtime, size, file in entries:
+            if now - mtime < max_age_seconds and total <= max_total_bytes:
+                break
+            if file.endswith(".tmp") and now - mtime < max_age_seconds:
+                continue  # a write still in progress
+            try:
+                os.unlink(file)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+            freed += size
+        return removed, freed
+
+    async def run_janitor(self, interval_seconds: float, max_age_seconds: float, max_total_bytes: int) -> None:
+        """Sweep the store every interval_seconds until cancelled."""
+        while True:
+            removed, freed = await asyncio.to_thread(self.sweep, max_age_seconds, max_total_bytes)
+            if removed:
+                logger.info("Payload janitor removed %d blobs (%d bytes) from %s", removed, freed, self.path)
+            await asyncio.sleep(interval_seconds)
@@ -1,12 +1,23 @@
+import argparse
 import os
 from dotenv import load_dotenv
 import asyncio
 from temporalio.client import Client
-from workflow import BulkCancelWorkflow
-from config import TEMPORAL_CANCELER_TASK_QUEUE, TEMPORAL_CANCELER_ADDRESS, TEMPORAL_CANCELER_NAMESPACE, TEMPORAL_CANCELER_API_KEY
+from workflow import BulkCancelWorkflow, cancel_settings
+from config import TEMPORAL_CANCELER_TASK_QUEUE, TEMPORAL_CANCELER_ADDRESS, TEMPORAL_CANCELER_NAMESPACE, TEMPORAL_CANCELER_API_KEY, TEMPORAL_TLS, WORKLOAD_ID
+from config import POLL_INTERVAL, MAX_POLLS, SHARD_COUNT, CANCEL_STRATEGY, TREE_DEPTH, LOCAL_ROUND_ROWS
 
 
+#   python run.py                 cancels WORKLOAD_ID from config.py
+#   python run.py 1 2 3           cancels several workloads together
+#   python run.py --filter '...'  cancels whatever a visibility filter matches
 async def main() -> None:
+    parser = argparse.ArgumentParser(description="Start a BulkCancelWorkflow")
+    parser.add_argument("workloads", nargs="*", help="WorkloadId values to cancel")
+    parser.add_argument("--filter", help="visibility filter selecting the workflows to cancel, instead of WorkloadIds")
+    args = parser.parse_args()
+    target = args.filter or args.workloads or WORKLOAD_ID
+
     interrupt_event = asyncio.Event()
     
     # Connect to Temporal server
@@ -14,12 +25,14 @@ async def main() -> None:
         TEMPORAL_CANCELER_ADDRESS,
         namespace=TEMPORAL_CANCELER_NAMESPACE,
         api_key=TEMPORAL_CANCELER_API_KEY,
-        tls=True,
+        tls=TEMPORAL_TLS,
     )
 
     workflow_id = f"canceler-workflow"
     handle = await client.start_workflow(
-        BulkCancelWorkflow.run, 
+        BulkCancelWorkflow.run,
+        # Tuning from this process's environment goes in the run arguments, so workers never read their own
+        args=[target, POLL_INTERVAL.total_seconds(), MAX_POLLS, SHARD_COUNT, CANCEL_STRATEGY, TREE_DEPTH, LOCAL_ROUND_ROWS, None, cancel_settings()],
         id=workflow_id,
         task_queue=TEMPORAL_CANCELER_TASK_QUEUE,
     )
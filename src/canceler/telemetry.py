@@ -0,0 +1,106 @@
+from __future__ import annotations
+import functools
+import json
+import logging
+from typing import Any, Dict, List, Mapping, Optional
+from temporalio.client import Interceptor
+from temporalio.runtime import OpenTelemetryConfig, PrometheusConfig, Runtime, TelemetryConfig
+
+_tracing_interceptor: Optional[type]
+try:
+    from temporalio.contrib.opentelemetry import TracingInterceptor  # optional: pip install "temporalio[opentelemetry]"
+    _tracing_interceptor = TracingInterceptor
+except ImportError:  # pragma: no cover - depends on the environment
+    _tracing_interceptor = None
+
+logger = logging.getLogger(__name__)
+
+# Attributes every LogRecord has; anything else was passed through extra= and belongs in the structured output
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, plus any extra= fields (activity info included)."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        out: Dict[str, Any] = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        out.update((k, v) for k, v in vars(record).items() if k not in _RECORD_FIELDS)
+        if record.exc_info:
+            out["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(out, default=str)
+
+
+def configure_logging(level: str, fmt: str) -> None:
+    handler = logging.StreamHandler()
+    if fmt == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(processName)s %(name)s: %(message)s"))
+    logging.basicConfig(level=level.upper(), handlers=[handler], force=True)
+
+
+def install_runtime(prometheus_address: Optional[str], otel_url: Optional[str], tags: Mapping[str, str], port_offset: int = 0) -> None:
+    """Make the default Runtime export SDK and canceler metrics. Call before the first client connects.
+
+    Prometheus wins when both are set. port_offset keeps launcher processes on the same host from fighting over one port.
+    """
+    metrics: Any
+    if prometheus_address:
+        host, port = prometheus_address.rsplit(":", 1)
+        target = f"{host}:{int(port) + port_offset}"
+        metrics = PrometheusConfig(bind_address=target)
+    elif otel_url:
+        target = otel_url
+        metrics = OpenTelemetryConfig(url=otel_url)
+    else:
+        return
+    Runtime.set_default(Runtime(telemetry=TelemetryConfig(metrics=metrics, global_tags=dict(tags))), error_if_already_set=False)
+    logger.info("Exporting metrics to %s", target)
+
+
+def client_interceptors(tracing: bool) -> List[Interceptor]:
+    """OpenTelemetry spans for workflow, activity and client calls, if asked for and the extra is installed.
+    Spans go to whatever tracer provider is configured, e.g. by running under opentelemetry-instrument."""
+    if not tracing:
+        return []
+    if _tracing_interceptor is None:
+        logger.warning("TRACING is on but temporalio[opentelemetry] isn't installed; running without spans")
+        return []
+    return [_tracing_interceptor()]
+
+
+class CancelerMetrics:
+    """Custom canceler metrics, exported next to the SDK's own through the default Runtime.
+    Without install_runtime they go to a meter that drops them."""
+
+    def __init__(self) -> None:
+        meter = Runtime.default().metric_meter
+        self.terminate_latency = meter.create_histogram_timedelta(
+            "canceler_terminate_latency", "Latency of one terminate RPC, by outcome", "ms")
+        self.terminate_outcomes = meter.create_counter(
+            "canceler_terminate_outcomes", "Terminate RPCs by outcome and gRPC status")
+        self.list_page_latency = meter.create_histogram_timedelta(
+            "canceler_list_page_latency", "Latency of one visibility list page", "ms")
+        self.list_page_rows = meter.create_histogram(
+            "canceler_list_page_rows", "Rows returned per visibility list page")
+        self.codec_offloaded_bytes = meter.create_counter(
+            "canceler_codec_offloaded_bytes", "Payload bytes written to the oversize payload store", "By")
+        self.codec_offloaded_payloads = meter.create_counter(
+            "canceler_codec_offloaded_payloads", "Payloads written to the oversize payload store")
+        self.limiter_waiting = meter.create_gauge(
+            "canceler_limiter_waiting", "Calls queued for a limiter slot, by limiter")
+        self.limiter_in_flight = meter.create_gauge(
+            "canceler_limiter_in_flight", "Calls holding a limiter slot, by limiter")
+        self.limiter_limit = meter.create_gauge(
+            "canceler_limiter_limit", "Current adaptive concurrency limit, by limiter")
+
+
+@functools.lru_cache(maxsize=None)
+def metrics() -> CancelerMetrics:
+    # Created on first use, after the worker has installed its runtime
+    return CancelerMetrics()
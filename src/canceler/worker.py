@@ -1,17 +1,30 @@
 from __future__ import annotations
 import os
+import signal
 from dotenv import load_dotenv
 import asyncio
+from typing import Any, Dict
 from temporalio.client import Client
-from temporalio.worker import Worker
-from workflow import BulkCancelWorkflow
-from activity import query_new_wf_executions, confirm_all_canceled, bulk_cancel_workflows
+from temporalio.worker import Worker, WorkerTuner, ResourceBasedSlotConfig
+from workflow import BulkCancelWorkflow, CancelShardWorkflow
+from activity import CLIENTS, query_new_wf_executions, query_wf_executions_page, count_new_wf_executions, split_start_times, confirm_all_canceled, bulk_cancel_workflows, track_batch, terminate_stragglers
 #from activity import batch_cancel_workflows #excluded for now due to lack of python report
 from payload_manager import Codec
+from payload_store import PayloadStore
 from temporalio.converter import DataConverter, DefaultPayloadConverter
+from config import PAYLOAD_CACHE_BYTES, PAYLOAD_MAX_AGE, PAYLOAD_MAX_BYTES, PAYLOAD_JANITOR_INTERVAL
+from config import ACTIVITY_CONCURRENCY, ACTIVITY_TASK_POLLS, ACTIVITY_TARGET_CPU, ACTIVITY_TARGET_MEMORY
+from config import WORKFLOW_TASK_CONCURRENCY, WORKFLOW_TASK_POLLS, WORKER_SHUTDOWN_TIMEOUT
+from config import CANCELER_PROMETHEUS_ADDRESS, OTEL_METRICS_URL, TRACING, LOG_LEVEL, LOG_FORMAT
+from telemetry import configure_logging, install_runtime, client_interceptors
 PAYLOAD_PATH = "/tmp/payloads"
-codec = Codec(path=PAYLOAD_PATH, min_bytes=1_000_000)  # tune threshold as needed
-from config import TEMPORAL_CANCELER_ADDRESS,TEMPORAL_CANCELER_API_KEY,TEMPORAL_CANCELER_TASK_QUEUE,TEMPORAL_CANCELER_NAMESPACE
+# zstd needs the optional zstandard package; the store falls back to zlib without it
+store = PayloadStore(PAYLOAD_PATH, compression=os.getenv("PAYLOAD_COMPRESSION", "zstd"))
+codec = Codec(path=PAYLOAD_PATH, min_bytes=1_000_000, store=store, cache_bytes=PAYLOAD_CACHE_BYTES)  # tune threshold as needed
+from config import TEMPORAL_CANCELER_ADDRESS,TEMPORAL_CANCELER_API_KEY,TEMPORAL_CANCELER_TASK_QUEUE,TEMPORAL_CANCELER_NAMESPACE,TEMPORAL_TLS
+
+# Worker roles: launcher.py runs one workflow process and several activity processes on the same task queue
+ROLE_ALL, ROLE_WORKFLOW, ROLE_ACTIVITY = "all", "workflow", "activity"
 
 interrupt_event = asyncio.Event()
 
@@ -20,27 +33,78 @@ data_converter = DataConverter(
     payload_codec=codec,
 )
 
-async def main():
+def _worker_options(role: str) -> Dict[str, Any]:
+    options: Dict[str, Any] = {"graceful_shutdown_timeout": WORKER_SHUTDOWN_TIMEOUT}
+    if role != ROLE_ACTIVITY:
+        options.update(
+            workflows=[BulkCancelWorkflow, CancelShardWorkflow],
+            max_cached_workflows=10000,
+            max_concurrent_workflow_task_polls=WORKFLOW_TASK_POLLS,
+            # Local activities run in the worker that runs the workflow
+            activities=[terminate_stragglers],
+        )
+    if role == ROLE_WORKFLOW:
+        options["no_remote_activities"] = True
+    else:
+        options.update(
+            activities=[query_new_wf_executions, query_wf_executions_page, count_new_wf_executions, split_start_times, confirm_all_canceled, bulk_cancel_workflows, track_batch, terminate_stragglers], # Batch Cancel Workflows is excluded
+            max_concurrent_activity_task_polls=ACTIVITY_TASK_POLLS,
+        )
+    if role == ROLE_ACTIVITY and ACTIVITY_TARGET_CPU > 0:
+        # A tuner replaces the fixed max_concurrent_* limits: slots are handed out while the box is under target
+        options["tuner"] = WorkerTuner.create_resource_based(
+            target_memory_usage=ACTIVITY_TARGET_MEMORY,
+            target_cpu_usage=ACTIVITY_TARGET_CPU,
+            activity_config=ResourceBasedSlotConfig(minimum_slots=1, maximum_slots=ACTIVITY_CONCURRENCY),
+        )
+    else:
+        if role != ROLE_ACTIVITY:
+            options["max_concurrent_workflow_tasks"] = WORKFLOW_TASK_CONCURRENCY
+        if role != ROLE_WORKFLOW:
+            options["max_concurrent_activities"] = ACTIVITY_CONCURRENCY
+    return options
+
+async def run_worker(role: str = ROLE_ALL, index: int = 0) -> None:
+    # Metrics for this process, SDK and custom, must be set up before any client connects.
+    # index is the launcher's process number, added to the Prometheus port.
+    configure_logging(LOG_LEVEL, LOG_FORMAT)
+    install_runtime(CANCELER_PROMETHEUS_ADDRESS, OTEL_METRICS_URL, {"service": "canceler", "role": role}, index)
+
     # Connect to Temporal Server. Change address if needed for your demo.
     # Initialize client connection
     client = await Client.connect(
         TEMPORAL_CANCELER_ADDRESS,
         namespace=TEMPORAL_CANCELER_NAMESPACE,
         api_key=TEMPORAL_CANCELER_API_KEY,
-        tls=True,
-        data_converter=data_converter
+        tls=TEMPORAL_TLS,
+        data_converter=data_converter,
+        interceptors=client_interceptors(TRACING),
     )
 
-    async with Worker(
-        client,
-        task_queue=TEMPORAL_CANCELER_TASK_QUEUE,
-        workflows=[BulkCancelWorkflow],
-        activities=[query_new_wf_executions, confirm_all_canceled, bulk_cancel_workflows], # Batch Cancel Workflows is excluded
-        max_cached_workflows = 10000,
-        max_concurrent_workflow_tasks = 1000
-    ):
-        # Keep the worker alive until interrupted (Ctrl+C during demos)
-        await interrupt_event.wait()
+    # Ctrl+C / SIGTERM (from the shell or launcher.py) stop polling and let in-flight tasks finish
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, interrupt_event.set)
+
+    # Keep /tmp/payloads bounded while the worker runs; one sweeper is enough when the launcher runs several processes
+    janitor = None
+    if role != ROLE_ACTIVITY:
+        janitor = asyncio.create_task(store.run_janitor(
+            PAYLOAD_JANITOR_INTERVAL.total_seconds(), PAYLOAD_MAX_AGE.total_seconds(), PAYLOAD_MAX_BYTES
+        ))
+
+    try:
+        async with Worker(client, task_queue=TEMPORAL_CANCELER_TASK_QUEUE, **_worker_options(role)):
+            # Keep the worker alive until interrupted (Ctrl+C during demos)
+            await interrupt_event.wait()
+    finally:
+        if janitor is not None:
+            janitor.cancel()
+        # The worker has drained its activities by now, so no terminate/list calls still need the channels
+        await CLIENTS.close()
+
+async def main():
+    await run_worker(ROLE_ALL)
 
 if __name__ == "__main__":
     asyncio.run(main())
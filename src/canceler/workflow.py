@@ -1,84 +1,689 @@
 from __future__ import annotations
 
+import asyncio
+import math
 from datetime import timedelta
-from typing import Sequence
+from typing import List, Optional, Tuple
 
 from temporalio import workflow
-from config import QUERY_TIMEOUT, CANCEL_TIMEOUT, CONFIRM_TIMEOUT,POLL_INTERVAL,MAX_POLLS,DEFAULT_RETRY, WORKLOAD_ID
+from temporalio.exceptions import ApplicationError
+from config import QUERY_TIMEOUT, CANCEL_TIMEOUT, CONFIRM_TIMEOUT,POLL_INTERVAL,MAX_POLLS,DEFAULT_RETRY, WORKLOAD_ID, QUERY_HEARTBEAT_TIMEOUT, CANCEL_HEARTBEAT_TIMEOUT, CONFIRM_HEARTBEAT_TIMEOUT
+from config import TRACK_TIMEOUT, TRACK_HEARTBEAT_TIMEOUT, TRACK_WINDOW
+from config import MAX_SHARDS, ROWS_PER_SHARD, CHILD_SHARD_ROWS, LOCAL_ROUND_TIMEOUT
+from config import CONTINUE_AS_NEW_EVENTS, CONTINUE_AS_NEW_BYTES, PHASE_BATCH, PHASE_CLEANUP
+from config import TERMINATED_FILTER_BITS, TERMINATED_FILTER_HASHES, TERMINATED_FILTER_MAX_RUNS
+from config import STRATEGY_BATCH, STRATEGY_TREE, STRATEGY_DIRECT, BATCH_PARTITIONS, BATCH_TERMINATE, TREE_MAX_LEVEL_IDS, TREE_IN_CHUNK
+from models import WorkflowPage, ConfirmResult, TerminateSummary, ShardResult, BatchProgress, BulkCancelState, CancelProgress, EPOCH, visibility_time, parse_visibility_time
+from models import Workloads, workload_filter, RunFilter, CancelSettings
+
+
+def cancel_settings() -> CancelSettings:
+    """The workflow tuning from config.py, for the starter to pass to BulkCancelWorkflow.run. Workflow code never
+    reads the environment itself, so workers configured differently still replay a run the same way."""
+    return CancelSettings(
+        max_shards=MAX_SHARDS,
+        rows_per_shard=ROWS_PER_SHARD,
+        child_shard_rows=CHILD_SHARD_ROWS,
+        tree_max_level_ids=TREE_MAX_LEVEL_IDS,
+        batch_partitions=BATCH_PARTITIONS,
+        batch_terminate=BATCH_TERMINATE,
+        continue_as_new_events=CONTINUE_AS_NEW_EVENTS,
+        continue_as_new_bytes=CONTINUE_AS_NEW_BYTES,
+        filter_bits=TERMINATED_FILTER_BITS,
+        filter_hashes=TERMINATED_FILTER_HASHES,
+        filter_max_runs=TERMINATED_FILTER_MAX_RUNS,
+    )
+
+
+def _merge_latest(latest: Optional[str], latest_ids: List[str], new: Optional[str], new_ids: List[str]) -> Tuple[Optional[str], List[str]]:
+    """Combine two (newest StartTime, IDs at that instant) marks."""
+    if new is None:
+        return latest, latest_ids
+    if latest is None or new > latest:
+        return new, list(new_ids)
+    if new == latest:
+        return latest, latest_ids + [i for i in new_ids if i not in latest_ids]
+    return latest, latest_ids
+
+
+def _settle(total: TerminateSummary, summary: TerminateSummary, rows: List[Tuple[str, str]], closed: Optional[RunFilter]) -> None:
+    total.merge(summary)
+    # The summary doesn't say which rows failed, so a page with failures records none of them and they stay eligible
+    if closed is not None and not summary.failed:
+        for workflow_id, run_id in rows:
+            closed.add(workflow_id, run_id)
+
+
+def _history_full(settings: CancelSettings) -> bool:
+    info = workflow.info()
+    return (info.is_continue_as_new_suggested() or info.get_current_history_length() >= settings.continue_as_new_events
+            or info.get_current_history_size() >= settings.continue_as_new_bytes)
+
+
+def _absorb(result: ShardResult, other: ShardResult) -> None:
+    # Fold another part of the same range into result
+    result.summary.merge(other.summary)
+    result.latest_start_time, result.latest_ids = _merge_latest(result.latest_start_time, result.latest_ids, other.latest_start_time, other.latest_ids)
+    result.workflow_ids.extend(other.workflow_ids)
+
+
+async def _terminate_range(target: str, since: str, exclude_ids: List[str], until: Optional[str] = None,
+                           extra_filter: Optional[str] = None, collect_ids: bool = False, concurrency: int = 0,
+                           skip: Optional[RunFilter] = None, closed: Optional[RunFilter] = None,
+                           token: Optional[str] = None, settings: Optional[CancelSettings] = None) -> ShardResult:
+    """Stream pages of running executions started in [since, until) into termination, listing the next page while
+    the previous one is terminated. IDs in exclude_ids were already seen at exactly `since` and are skipped.
+    Runs in skip were already closed and are only counted; runs closed here are added to closed.
+
+    Every page passes through history twice, as the listing's result and the terminate's input. With settings, the
+    listing stops once history is full and the result's next_page_token says where the rest of the range starts.
+    """
+    result = ShardResult()
+    pending: Optional[workflow.ActivityHandle] = None
+    pending_rows: List[Tuple[str, str]] = []
+    while True:
+        page: WorkflowPage = await workflow.execute_activity(
+            "query_wf_executions_page",
+            args=(target, since, token, exclude_ids, until, extra_filter),
+            result_type=WorkflowPage,
+            start_to_close_timeout=QUERY_TIMEOUT,
+            heartbeat_timeout=QUERY_HEARTBEAT_TIMEOUT,
+            retry_policy=DEFAULT_RETRY,
+        )
+        if pending is not None:
+            _settle(result.summary, await pending, pending_rows, closed)
+            pending = None
+        if collect_ids:
+            result.workflow_ids.extend(page.workflow_ids)
+        ids, run_ids, workloads = page.workflow_ids, page.run_ids, page.workloads
+        if skip is not None and skip.count:
+            # Visibility lags behind terminations, so runs closed in an earlier pass can still be listed as Running
+            keep = [i for i, (wf_id, run_id) in enumerate(zip(ids, run_ids)) if not skip.contains(wf_id, run_id)]
+            result.summary.skipped += len(ids) - len(keep)
+            ids, run_ids = [ids[i] for i in keep], [run_ids[i] for i in keep]
+            workloads = [workloads[i] for i in keep] if workloads else workloads
+        if ids:
+            pending = workflow.start_activity(
+                "bulk_cancel_workflows",
+                args=(ids, run_ids, concurrency, workloads),
+                result_type=TerminateSummary,
+                start_to_close_timeout=CANCEL_TIMEOUT,
+                heartbeat_timeout=CANCEL_HEARTBEAT_TIMEOUT,
+                retry_policy=DEFAULT_RETRY,
+            )
+            pending_rows = list(zip(ids, run_ids))
+        result.latest_start_time, result.latest_ids = _merge_latest(result.latest_start_time, result.latest_ids, page.latest_start_time, page.latest_ids)
+        token = page.next_page_token
+        if token is None:
+            break
+        if settings is not None and _history_full(settings):
+            result.next_page_token = token
+            break
+    if pending is not None:
+        _settle(result.summary, await pending, pending_rows, closed)
+    return result
+
+
+@workflow.defn
+class CancelShardWorkflow:
+    """Terminates one StartTime range of a sharded BulkCancelWorkflow pass, keeping its activity events out of the parent's history."""
+
+    @workflow.run
+    async def run(self, target: str, since: str, exclude_ids: List[str], until: Optional[str] = None, concurrency: int = 0,
+                  settings: Optional[CancelSettings] = None, extra_filter: Optional[str] = None, collect_ids: bool = False,
+                  token: Optional[str] = None, carried: Optional[ShardResult] = None) -> ShardResult:
+        # token and carried pick the range up where an earlier run, or a parent whose history filled, left off.
+        # No closed-run filter goes in or out: at a few hundred KB it would be copied into every child's input and result.
+        # A shard lists its range once, so it has nothing to skip; the parent's next pass may list what it closed again,
+        # and terminating those just finds them already closed.
+        settings = settings or CancelSettings()
+        result = await _terminate_range(target, since, exclude_ids, until, extra_filter, collect_ids, concurrency,
+                                        token=token, settings=settings)
+        if carried is not None:
+            _absorb(result, carried)
+        if result.next_page_token is not None:
+            token, result.next_page_token = result.next_page_token, None
+            workflow.logger.info("Continuing shard as new after %d terminated", result.summary.done)
+            workflow.continue_as_new(args=[target, since, exclude_ids, until, concurrency, settings, extra_filter, collect_ids, token, result])
+        return result
+
+
 @workflow.defn
 class BulkCancelWorkflow:
     """
     Queries for running workflows by workload_id, issues bulk cancels, then polls
     until all are confirmed canceled (or we hit MAX_POLLS).
+
+    workload_id may also be a list of IDs, listed together with one `WorkloadId IN (...)` query per pass,
+    or any visibility filter string.
     """
     def __init__(self):
         self.fully_canceled = False
+        # High-water mark of the newest StartTime already listed, plus the IDs started at exactly that instant
+        self.watermark: str = EPOCH
+        self.watermark_ids: List[str] = []
+        self.settings = CancelSettings()
+        self.shard_count = 0
+        self.strategy = STRATEGY_BATCH
+        self.sweep_from = EPOCH  # where the watermark rewinds to for a full sweep
+        self.tree_depth = 2
+        self.passes = 0
+        self.batch_job_ids: List[str] = []
+        self.batch_progress: Optional[BatchProgress] = None
+        self.last_pass_rows: Optional[int] = None
+        # Latest estimate of what the next pass will find: last pass's rows, or the running count from a confirm
+        self.expected_rows: Optional[int] = None
+        self.local_round_rows = 200
+        # Continue-as-new bookkeeping, see BulkCancelState
+        self.phase = PHASE_CLEANUP
+        self.attempt = 0
+        self.runs = 1
+        self.totals = TerminateSummary()
+        # Run arguments and tuning; the update handlers change these on a running cancel
+        self.workload_id: Workloads = WORKLOAD_ID
+        self.target = workload_filter(WORKLOAD_ID)  # visibility clause for workload_id
+        self.poll_interval = POLL_INTERVAL
+        self.max_polls = MAX_POLLS
+        self.concurrency = 0
+        self.switch_to: Optional[str] = None
+        # Progress reported by the progress query
+        self.started_at: Optional[str] = None
+        self.last_remaining: Optional[int] = None
+        self.last_pass_throughput: Optional[float] = None
+        self.handoffs = 0  # ranges handed to a child because history filled mid-pass, for unique child IDs
+        # Runs already closed by this cancel, skipped when visibility lists them again
+        self.closed_runs = RunFilter(self.settings.filter_bits, self.settings.filter_hashes)
 
-    @workflow.run
-    async def run(self, workload_id: int = WORKLOAD_ID, poll_interval: timedelta = POLL_INTERVAL, max_polls: int = MAX_POLLS):
-        logger = workflow.logger
-        logger.info("Starting termination process...")
-
-        #Begin Workflow Logic 
-        
-        #First, we will kick off the batch job using an activity:
-        batch_job_id = await workflow.execute_activity(
-                        "batch_cancel_workflows",
-                        task_queue="batch-queue",
-                        start_to_close_timeout=CANCEL_TIMEOUT,
-                        retry_policy=DEFAULT_RETRY,
-                        )
-        batch_start_time = workflow.now() #We want to capture the time that we triggered the batch job in order to re-use it for the query in our cleanup system 
-        workflow.logger.info(f"Requested batch cancel for relevant workflows at {batch_start_time}")
+    def _advance_watermark(self, latest: Optional[str], latest_ids: List[str]) -> None:
+        watermark, self.watermark_ids = _merge_latest(self.watermark, self.watermark_ids, latest, latest_ids)
+        self.watermark = watermark or self.watermark
 
-        #Second, we will track the progress of our batch job and run interim cancelations on any workflows spawned while we are waiting
-        while not self.fully_canceled:
-                for attempt in range(1,MAX_POLLS+1):
-                # 1) Check for new workflow executions that have spawned
-                    timestamp = batch_start_time.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z" 
-                    workflow_ids: Sequence[str] = await workflow.execute_activity(
-                        "query_new_wf_executions",
-                        args =(workload_id, timestamp),
-                        start_to_close_timeout=QUERY_TIMEOUT,
-                        retry_policy=DEFAULT_RETRY,
+    async def _range(self, target: str, since: str, exclude_ids: List[str], until: Optional[str] = None,
+                     extra_filter: Optional[str] = None, collect_ids: bool = False) -> ShardResult:
+        """_terminate_range in this workflow, handing the rest of the range to a CancelShardWorkflow child once history
+        is full, so a large in-process pass can't grow history without bound."""
+        result = await _terminate_range(target, since, exclude_ids, until, extra_filter, collect_ids, self.concurrency,
+                                        skip=self.closed_runs, closed=self.closed_runs, settings=self.settings)
+        if result.next_page_token is not None:
+            self.handoffs += 1
+            workflow.logger.info("History full during pass %d; handing the rest of the range to a child workflow", self.passes)
+            rest = await workflow.execute_child_workflow(
+                CancelShardWorkflow.run,
+                args=(target, since, exclude_ids, until, self.concurrency, self.settings, extra_filter, collect_ids,
+                      result.next_page_token),
+                id=f"{workflow.info().workflow_id}-pass-{self.passes}-rest-{self.handoffs}",
+            )
+            result.next_page_token = None
+            _absorb(result, rest)
+        return result
+
+    async def _split(self, target: str, since: str, exclude_ids: List[str], parts: int, matching: int) -> List[str]:
+        """StartTime bounds between `parts` ranges from since to now that hold about equal numbers of the matching rows."""
+        return await workflow.execute_activity(
+            "split_start_times",
+            args=(target, since, visibility_time(workflow.now()), parts, matching, exclude_ids),
+            result_type=List[str],
+            start_to_close_timeout=QUERY_TIMEOUT,
+            heartbeat_timeout=QUERY_HEARTBEAT_TIMEOUT,
+            retry_policy=DEFAULT_RETRY,
+        )
+
+    async def _plan_shards(self, target: str, since: str, exclude_ids: List[str]) -> Tuple[int, bool, int]:
+        """Pick the shard count for this pass, whether shards should run as child workflows, and the rows counted."""
+        # Auto mode only pays for a count when the previous pass was big enough to be worth splitting
+        if self.shard_count == 1 or (self.shard_count == 0 and self.last_pass_rows is not None and self.last_pass_rows < self.settings.rows_per_shard):
+            return 1, False, 0
+        matching: int = await workflow.execute_activity(
+            "count_new_wf_executions",
+            args=(target, since, exclude_ids),
+            start_to_close_timeout=QUERY_TIMEOUT,
+            retry_policy=DEFAULT_RETRY,
+        )
+        settings = self.settings
+        shards = self.shard_count or min(settings.max_shards, max(1, math.ceil(matching / settings.rows_per_shard)))
+        return shards, matching >= settings.child_shard_rows, matching
+
+    async def _terminate_new_executions(self, target: str) -> TerminateSummary:
+        """Terminate everything started at or after the watermark, excluding the IDs already seen at that instant.
+
+        Large passes are split into StartTime ranges that run in parallel, so terminate throughput
+        scales with the number of canceler workers instead of being capped by one activity.
+        """
+        since, exclude_ids = self.watermark, list(self.watermark_ids)
+        self.passes += 1
+        pass_start = workflow.now()
+        if self.closed_runs.count >= self.settings.filter_max_runs:
+            # Past its capacity the filter's false-positive rate climbs, so start a fresh one
+            workflow.logger.info("Closed-run filter holds %d runs; starting over", self.closed_runs.count)
+            self._reset_closed_runs()
+        if self.local_round_rows > 0 and self.expected_rows is not None and self.expected_rows <= self.local_round_rows:
+            # Only a few stragglers left: list and terminate them in one local activity, skipping the task queue.
+            # Local activity inputs stay out of history, so the filter always goes along, if only for its shape.
+            result: ShardResult = await workflow.execute_local_activity(
+                "terminate_stragglers",
+                args=(target, since, exclude_ids, self.local_round_rows, self.closed_runs.dump()),
+                result_type=ShardResult,
+                start_to_close_timeout=LOCAL_ROUND_TIMEOUT,
+                retry_policy=DEFAULT_RETRY,
+            )
+            # Merge what the round closed before anything else lists the range again
+            if result.closed:
+                self.closed_runs.union(RunFilter.load(result.closed))
+                result.closed = None
+            results = [result]
+            if result.truncated:
+                # More than expected; finish the range with regular activities
+                results.append(await self._range(target, since, exclude_ids))
+        else:
+            shards, as_children, matching = await self._plan_shards(target, since, exclude_ids)
+            if shards == 1:
+                results = [await self._range(target, since, exclude_ids)]
+            else:
+                # StartTime slices holding about equal counted rows; the first keeps the tie-breaker IDs, the last is open-ended
+                cuts = await self._split(target, since, exclude_ids, shards, matching)
+                lows = [since, *cuts]
+                highs: List[Optional[str]] = [*cuts, None]
+                ranges = [(lows[k], exclude_ids if k == 0 else [], highs[k]) for k in range(len(lows))]
+                workflow.logger.info("Terminating pass %d in %d shards%s", self.passes, len(ranges), " as child workflows" if as_children else "")
+                if as_children:
+                    results = await asyncio.gather(*(
+                        workflow.execute_child_workflow(
+                            CancelShardWorkflow.run,
+                            args=(target, lo, excl, hi, self.concurrency, self.settings),
+                            id=f"{workflow.info().workflow_id}-pass-{self.passes}-shard-{k}",
                         )
-                    # 2A) If new workflows have spawned since triggering the batch job, we will send requests to have them terminated. 
-                    if workflow_ids:
-                        canceled = await workflow.execute_activity(
-                            "bulk_cancel_workflows",
-                            workflow_ids,
+                        for k, (lo, excl, hi) in enumerate(ranges)
+                    ))
+                else:
+                    results = await asyncio.gather(*(
+                        self._range(target, lo, excl, hi) for lo, excl, hi in ranges
+                    ))
+
+        summary = TerminateSummary()
+        for result in results:
+            summary.merge(result.summary)
+            self._advance_watermark(result.latest_start_time, result.latest_ids)
+        # IDs that failed to terminate must be listed again, so don't move past them
+        if summary.failed:
+            self.watermark, self.watermark_ids = since, exclude_ids
+        self.last_pass_rows = self.expected_rows = summary.done + summary.failed
+        self.totals.merge(summary)
+        seconds = (workflow.now() - pass_start).total_seconds()
+        self.last_pass_throughput = round(self.last_pass_rows / seconds, 1) if seconds > 0 else None
+        return summary
+
+    async def _terminate_tree(self, target: str) -> TerminateSummary:
+        """Terminate roots, then interior nodes level by level, and let ParentClosePolicy.TERMINATE cascade to the
+        leaves. Each level is found by ParentWorkflowId, so only non-leaf nodes cost a client-side RPC.
+        """
+        summary = TerminateSummary()
+        level_filters = ["ParentWorkflowId IS NULL"]
+        for depth in range(1, self.tree_depth + 1):
+            results = await asyncio.gather(*(
+                self._range(target, EPOCH, [], extra_filter=f, collect_ids=depth < self.tree_depth) for f in level_filters
+            ))
+            parents: List[str] = []
+            for result in results:
+                summary.merge(result.summary)
+                parents.extend(result.workflow_ids)
+            workflow.logger.info("Terminated tree level %d: %d nodes", depth, sum(r.summary.done for r in results))
+            if not parents or len(parents) > self.settings.tree_max_level_ids:
+                break
+            level_filters = [
+                "ParentWorkflowId IN (" + ", ".join(f'"{p}"' for p in parents[i:i + TREE_IN_CHUNK]) + ")"
+                for i in range(0, len(parents), TREE_IN_CHUNK)
+            ]
+        return summary
+
+    async def _track_batch(self) -> BatchProgress:
+        """Wait on the batch job(s) for up to TRACK_WINDOW; returns early once they all finish."""
+        self.batch_progress = await workflow.execute_activity(
+            "track_batch",
+            args=(self.batch_job_ids, TRACK_WINDOW.total_seconds()),
+            result_type=BatchProgress,
+            start_to_close_timeout=TRACK_TIMEOUT,
+            heartbeat_timeout=TRACK_HEARTBEAT_TIMEOUT,
+            retry_policy=DEFAULT_RETRY,
+        )
+        return self.batch_progress
+
+    @staticmethod
+    def _log_pass(summary: TerminateSummary, target: str) -> None:
+        if summary.done or summary.failed:
+            workflow.logger.info(
+                "Requested cancel for %d workflows (%d terminated, %d already closed, %d failed %s, %d retries)",
+                summary.done + summary.failed,
+                summary.terminated,
+                summary.already_closed,
+                summary.failed,
+                summary.failed_by_status,
+                summary.retries,
+            )
+        elif summary.skipped:
+            workflow.logger.info("No new workflows found matching %s (%d already closed, skipped)", target, summary.skipped)
+        else:
+            workflow.logger.info("No new workflows found matching %s", target)
+
+    async def _confirm(self, target: str) -> ConfirmResult:
+        confirmed: ConfirmResult = await workflow.execute_activity(
+            "confirm_all_canceled",
+            target,
+            result_type=ConfirmResult,
+            start_to_close_timeout=CONFIRM_TIMEOUT,
+            heartbeat_timeout=CONFIRM_HEARTBEAT_TIMEOUT,
+            retry_policy=DEFAULT_RETRY,
+        )
+        self.expected_rows = self.last_remaining = confirmed.remaining
+        return confirmed
+
+    def _snapshot(self) -> BulkCancelState:
+        return BulkCancelState(
+            phase=self.phase,
+            sweep_from=self.sweep_from,
+            watermark=self.watermark,
+            watermark_ids=list(self.watermark_ids),
+            passes=self.passes,
+            attempt=self.attempt,
+            last_pass_rows=self.last_pass_rows,
+            expected_rows=self.expected_rows,
+            batch_job_ids=list(self.batch_job_ids),
+            totals=self.totals,
+            runs=self.runs + 1,
+            started_at=self.started_at,
+            last_remaining=self.last_remaining,
+            concurrency=self.concurrency,
+            switch_to=self.switch_to,
+            closed_runs=self.closed_runs.dump() if self.closed_runs.count else None,
+        )
+
+    def _restore(self, state: BulkCancelState) -> None:
+        self.phase = state.phase
+        self.sweep_from = state.sweep_from
+        self.watermark, self.watermark_ids = state.watermark or state.sweep_from, list(state.watermark_ids)
+        self.passes = state.passes
+        self.attempt = state.attempt
+        self.last_pass_rows = state.last_pass_rows
+        self.expected_rows = state.expected_rows
+        self.batch_job_ids = list(state.batch_job_ids)
+        self.totals = state.totals
+        self.runs = state.runs
+        self.started_at = state.started_at
+        self.last_remaining = state.last_remaining
+        self.concurrency = state.concurrency
+        self.switch_to = state.switch_to
+        if state.closed_runs:
+            self.closed_runs = RunFilter.load(state.closed_runs)
+
+    def _reset_closed_runs(self) -> None:
+        self.closed_runs = RunFilter(self.settings.filter_bits, self.settings.filter_hashes)
+
+    async def _checkpoint(self) -> None:
+        """Continue as new between passes once history is getting long, carrying the watermark, counts, job IDs and
+        whatever the update handlers have changed."""
+        info = workflow.info()
+        if _history_full(self.settings):
+            # Let update handlers finish so their callers get a result from this run
+            await workflow.wait_condition(workflow.all_handlers_finished)
+            workflow.logger.info(
+                "Continuing as new after %d events (run %d, %d passes, %d terminated so far)",
+                info.get_current_history_length(), self.runs, self.passes, self.totals.done,
+            )
+            workflow.continue_as_new(args=[
+                self.workload_id, self.poll_interval.total_seconds(), self.max_polls, self.shard_count,
+                self.strategy, self.tree_depth, self.local_round_rows, self._snapshot(), self.settings,
+            ])
+
+    async def _begin(self, strategy: str) -> None:
+        """The opening move of a strategy, run at the start or when an update switches to it."""
+        target = self.target
+        if strategy == STRATEGY_TREE:
+            #First, we terminate the roots and interior nodes of the workflow tree and let the server cascade to the leaves
+            tree_summary = await self._terminate_tree(target)
+            self.totals.merge(tree_summary)
+            workflow.logger.info("Terminated %d tree nodes directly; waiting for the cascade", tree_summary.done)
+            #Cleanup passes sweep every StartTime, since orphans can have any
+            self.sweep_from = EPOCH
+            self.watermark, self.watermark_ids = self.sweep_from, []
+            #A confirm gives up after its time window even while the count is still dropping. Wait on until the cascade
+            #stalls, so the sweeps only terminate what it missed instead of racing it to leaves it was about to reach.
+            cascade = await self._confirm(target)
+            previous: Optional[int] = None
+            while not (cascade.confirmed or cascade.stalled) and (previous is None or cascade.remaining < previous):
+                previous = cascade.remaining
+                workflow.logger.info("Cascade still draining with %d running; waiting on it", previous)
+                cascade = await self._confirm(target)
+            if cascade.confirmed:
+                self.fully_canceled = True
+        elif strategy == STRATEGY_DIRECT:
+            #No batch job: the cleanup passes list and terminate every matching workflow themselves
+            self.sweep_from = EPOCH
+            self.watermark, self.watermark_ids = self.sweep_from, []
+        else:
+            #Partitioned batch jobs split the matching rows evenly by count rather than spacing time over a guessed window
+            bounds: List[str] = []
+            if self.settings.batch_partitions > 1:
+                matching: int = await workflow.execute_activity(
+                    "count_new_wf_executions",
+                    args=(target, EPOCH, []),
+                    start_to_close_timeout=QUERY_TIMEOUT,
+                    retry_policy=DEFAULT_RETRY,
+                )
+                if matching:
+                    bounds = await self._split(target, EPOCH, [], self.settings.batch_partitions, matching)
+            #First, we will kick off the batch job(s) using an activity:
+            self.batch_job_ids = await workflow.execute_activity(
+                            "batch_cancel_workflows",
+                            args=(target, self.settings.batch_terminate, len(bounds) + 1, None, bounds),
+                            task_queue="batch-queue",
+                            result_type=List[str],
                             start_to_close_timeout=CANCEL_TIMEOUT,
                             retry_policy=DEFAULT_RETRY,
-                        )
-                        canceled = int(canceled or 0)
-                        workflow.logger.info("Requested cancel for %d workflows", canceled)
-
-                    # 2B) Log that there are no new workflows to cancel
-                    else:
-                        workflow.logger.info("No new workflows found for workload_id=%s", workload_id)
-
-                    # 3) Poll for some time to see if all of the workflows are canceled
-                    
-                        confirmed = await workflow.execute_activity(
-                            "confirm_all_canceled",
-                            workload_id,
-                            start_to_close_timeout=CONFIRM_TIMEOUT,
-                            retry_policy=DEFAULT_RETRY,
-                        )
+                            )
+            batch_start_time = workflow.now() #We want to capture the time that we triggered the batch job in order to re-use it for the query in our cleanup system
+            workflow.logger.info(f"Requested batch cancel for relevant workflows at {batch_start_time}: jobs {self.batch_job_ids}")
+            self.sweep_from = visibility_time(batch_start_time)
+            self.watermark, self.watermark_ids = self.sweep_from, []
+            self.phase = PHASE_BATCH
+
+    async def _batch_phase(self) -> None:
+        #While the batch job runs, clean up anything spawned after it started, checking on the job in between passes
+        #instead of polling visibility on a fixed interval. A strategy switch ends the phase early.
+        target = self.target
+        while True:
+            await self._checkpoint()
+            self._log_pass(await self._terminate_new_executions(target), target)
+            progress = await self._track_batch()
+            workflow.logger.info(
+                "Batch progress: %d/%d completed, %d failed", progress.completed, progress.total, progress.failed
+            )
+            if progress.done or self.switch_to is not None:
+                break
+        self.phase = PHASE_CLEANUP
+        #A failed job leaves older workflows behind, so later sweeps have to cover every StartTime
+        if progress.failed_jobs:
+            workflow.logger.warning("Batch jobs failed: %s; sweeping all running workflows", progress.failed_jobs)
+            self.sweep_from = EPOCH
+            self.watermark, self.watermark_ids = self.sweep_from, []
+
+    async def _switch_strategy(self) -> None:
+        strategy, self.switch_to = self.switch_to, None
+        if strategy is None:
+            return
+        workflow.logger.info("Switching strategy from %s to %s", self.strategy, strategy)
+        self.strategy = strategy
+        await self._begin(strategy)
+
+    async def _pause(self) -> None:
+        # Sleep for the poll interval, waking early if an update switches strategy
+        try:
+            await workflow.wait_condition(lambda: self.switch_to is not None, timeout=self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+
+    @workflow.query
+    def progress(self) -> CancelProgress:
+        """Where the cancel has got, from workflow state alone; costs no visibility calls."""
+        elapsed = (workflow.now() - parse_visibility_time(self.started_at)).total_seconds() if self.started_at else 0.0
+        return CancelProgress(
+            phase=self.phase,
+            strategy=self.strategy,
+            fully_canceled=self.fully_canceled,
+            runs=self.runs,
+            passes=self.passes,
+            attempt=self.attempt,
+            batch_job_ids=list(self.batch_job_ids),
+            batch_progress=self.batch_progress,
+            terminated=self.totals.terminated,
+            already_closed=self.totals.already_closed,
+            failed=self.totals.failed,
+            retries=self.totals.retries,
+            skipped=self.totals.skipped,
+            last_pass_rows=self.last_pass_rows,
+            last_remaining=self.last_remaining,
+            elapsed_seconds=round(elapsed, 1),
+            throughput=round(self.totals.done / elapsed, 1) if elapsed > 0 else 0.0,
+            last_pass_throughput=self.last_pass_throughput,
+            concurrency=self.concurrency,
+            shard_count=self.shard_count,
+            poll_interval_seconds=self.poll_interval.total_seconds(),
+            pending_strategy=self.switch_to,
+            target=self.target,
+        )
+
+    @workflow.update
+    def set_concurrency(self, concurrency: int, shard_count: Optional[int] = None) -> int:
+        """Terminate calls in flight per activity from the next page on (0 means the worker's CANCEL_CONCURRENCY),
+        and optionally the shard count for the next pass. Returns the previous concurrency."""
+        previous, self.concurrency = self.concurrency, concurrency
+        if shard_count is not None:
+            self.shard_count = shard_count
+        workflow.logger.info("Concurrency set to %d (was %d), shard count %d", concurrency, previous, self.shard_count)
+        return previous
+
+    @set_concurrency.validator
+    def _validate_concurrency(self, concurrency: int, shard_count: Optional[int] = None) -> None:
+        if concurrency < 0:
+            raise ValueError("concurrency must be 0 (worker default) or more")
+        if shard_count is not None and not 0 <= shard_count <= self.settings.max_shards:
+            raise ValueError(f"shard_count must be between 0 (auto) and {self.settings.max_shards}")
+
+    @workflow.update
+    def set_poll_interval(self, seconds: float) -> float:
+        """Time between confirm attempts that still find workflows running. Returns the previous value in seconds."""
+        previous = self.poll_interval.total_seconds()
+        self.poll_interval = timedelta(seconds=seconds)
+        workflow.logger.info("Poll interval set to %ss (was %ss)", seconds, previous)
+        return previous
+
+    @set_poll_interval.validator
+    def _validate_poll_interval(self, seconds: float) -> None:
+        if seconds <= 0:
+            raise ValueError("poll interval must be positive")
+
+    @workflow.update
+    def set_strategy(self, strategy: str) -> str:
+        """Switch strategy at the next pass boundary: "batch" starts a new batch job, "tree" terminates the tree,
+        "direct" stops waiting on any batch job and sweeps every StartTime. Returns the previous strategy."""
+        previous = self.strategy
+        self.switch_to = strategy
+        return previous
+
+    @set_strategy.validator
+    def _validate_strategy(self, strategy: str) -> None:
+        if strategy not in (STRATEGY_BATCH, STRATEGY_TREE, STRATEGY_DIRECT):
+            raise ValueError(f"unknown strategy {strategy!r}")
+        if self.fully_canceled:
+            raise ValueError("cancel has already finished")
+        if strategy == (self.switch_to or self.strategy):
+            raise ValueError(f"already using {strategy}")
+
+    @workflow.run
+    async def run(self, workload_id: Workloads = WORKLOAD_ID, poll_interval_seconds: float = POLL_INTERVAL.total_seconds(), max_polls: int = MAX_POLLS, shard_count: int = 0,
+                  strategy: str = STRATEGY_BATCH, tree_depth: int = 2, local_round_rows: int = 200,
+                  state: Optional[BulkCancelState] = None, settings: Optional[CancelSettings] = None):
+        # Defaults here are code constants rather than config.py's environment: run.py passes those explicitly
+        self.workload_id = workload_id
+        self.settings = settings or CancelSettings()
+        self._reset_closed_runs()
+        try:
+            self.target = workload_filter(workload_id)
+        except ValueError as err:
+            raise ApplicationError(str(err), non_retryable=True)
+        # Seconds rather than a timedelta, which the default JSON converter can't carry through continue_as_new
+        self.poll_interval = timedelta(seconds=poll_interval_seconds)
+        self.max_polls = max_polls
+        self.shard_count = shard_count
+        self.local_round_rows = local_round_rows
+        self.strategy = strategy
+        self.tree_depth = tree_depth
+        logger = workflow.logger
+
+        #Begin Workflow Logic
+
+        if state is not None:
+            #Picking up where the previous run continued as new
+            self._restore(state)
+            logger.info("Resuming termination in run %d (%s phase, %d passes so far)", self.runs, self.phase, self.passes)
+        else:
+            logger.info("Starting termination process...")
+            self.started_at = visibility_time(workflow.now())
+            await self._begin(self.strategy)
+
+        #Finally, keep terminating stragglers until a confirmation finds nothing left running
+        while not self.fully_canceled:
+                if self.phase == PHASE_BATCH:
+                    await self._batch_phase()
+                for attempt in range(self.attempt + 1, self.max_polls + 1):
+                    if self.switch_to is not None:
+                        await self._switch_strategy()
+                        # A new batch job needs its own tracking phase; a tree pass may have finished the job
+                        if self.phase == PHASE_BATCH or self.fully_canceled:
+                            break
+                    await self._checkpoint()
+                    self.attempt = attempt
+                # 1) Check for new workflow executions that have spawned since the watermark and terminate them page by page
+                    summary = await self._terminate_new_executions(self.target)
+                    self._log_pass(summary, self.target)
+
+                    # 2A) If new workflows had spawned since triggering the batch job, they have been sent terminate requests
+                    # and we go straight to the next pass.
+                    # 2B) Otherwise there are no new workflows to cancel and we confirm.
+                    if not (summary.done or summary.failed):
+                        # 3) Poll for some time to see if all of the workflows are canceled
+                        confirmed = await self._confirm(self.target)
                         # 3A) If there are no more jobs picked up by the query, then end the loop
-                        if confirmed:
+                        if confirmed.confirmed:
                             self.fully_canceled = True
                             workflow.logger.info("All workflows confirmed canceled after %d polls", attempt)
-                            response = "Cancelation Successful"
+                            break
 
-                        # 3B) Otherwise, continue the loop
+                        # 3B) Otherwise, continue the loop. Visibility may index a workflow after we've moved past its StartTime,
+                        # so rewind the watermark and sweep everything since the batch once more.
                         else:
+                            self.watermark, self.watermark_ids = self.sweep_from, []
+                            # A stalled count means the stragglers aren't draining on their own; re-terminate right away
+                            if confirmed.stalled:
+                                workflow.logger.info(
+                                    "Cancel stalled with %d still running (attempt %d/%d); re-running termination",
+                                    confirmed.remaining,
+                                    attempt,
+                                    self.max_polls,
+                                )
+                                # A false positive in the closed-run filter would skip a live run on every pass
+                                self._reset_closed_runs()
+                                continue
                             workflow.logger.info(
-                                "Not yet fully canceled (attempt %d/%d); sleeping %ss",
+                                "Not yet fully canceled, %d still running (attempt %d/%d); sleeping %ss",
+                                confirmed.remaining,
                                 attempt,
-                                max_polls,
-                                int(poll_interval.total_seconds()),
+                                self.max_polls,
+                                int(self.poll_interval.total_seconds()),
                             )
-                            await workflow.sleep(poll_interval)
-        
-        return response
+                            await self._pause()
+                self.attempt = 0
+
+        logger.info(
+            "Terminated %d workflows in %d passes over %d runs (%d already closed, %d failed, %d skipped as closed)",
+            self.totals.terminated, self.passes, self.runs, self.totals.already_closed, self.totals.failed, self.totals.skipped,
+        )
+        return "Cancelation Successful"
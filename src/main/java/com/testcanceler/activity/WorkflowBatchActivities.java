@@ -3,9 +3,22 @@ package com.testcanceler.activity;
 import io.temporal.activity.ActivityInterface;
 import io.temporal.activity.ActivityMethod;
 
+import java.util.List;
+
 
 @ActivityInterface
 public interface WorkflowBatchActivities {
+    /**
+     * Starts server-side batch jobs against running workflows that match the given filter.
+     *
+     * @param target     visibility filter selecting the workloads, e.g. {@code WorkloadId IN ("1", "2")}
+     * @param terminate  true to terminate, false to request cancellation
+     * @param partitions number of batch jobs to split the StartTime range into (1 = a single job); ignored with bounds
+     * @param since      ISO-8601 lower bound used to space the partitions; null uses the default lookback
+     * @param bounds     StartTime bounds between partitions, in order, e.g. sized by row counts; null or empty
+     *                   spaces {@code partitions} evenly in time from {@code since}
+     * @return the started batch job IDs
+     */
     @ActivityMethod(name="batch_cancel_workflows")
-    void batchCancelWorkflows();
-}
\ No newline at end of file
+    List<String> batchCancelWorkflows(String target, boolean terminate, int partitions, String since, List<String> bounds);
+}
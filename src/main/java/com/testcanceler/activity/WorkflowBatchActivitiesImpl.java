@@ -1,31 +1,46 @@
 package com.testcanceler.activity;
 
-import io.temporal.activity.ActivityInterface;
-import io.temporal.activity.ActivityMethod;
 import io.temporal.activity.Activity;
-import io.temporal.client.WorkflowClient;
+import io.temporal.activity.ActivityInfo;
 import io.temporal.api.batch.v1.BatchOperationCancellation;
 import io.temporal.api.batch.v1.BatchOperationTermination;
-import io.temporal.api.workflowservice.v1.StartBatchOperationResponse;
-import io.temporal.serviceclient.WorkflowServiceStubs;
+import io.temporal.api.workflowservice.v1.DescribeBatchOperationRequest;
+import io.temporal.api.workflowservice.v1.DescribeBatchOperationResponse;
 import io.temporal.api.workflowservice.v1.StartBatchOperationRequest;
-import io.temporal.api.batch.v1.BatchOperationCancellation;
+import io.temporal.api.workflowservice.v1.StartBatchOperationResponse;
+import io.temporal.failure.ApplicationFailure;
 import io.temporal.serviceclient.WorkflowServiceStubs;
 import io.temporal.serviceclient.WorkflowServiceStubsOptions;
-import io.temporal.client.WorkflowClientOptions;
+import io.grpc.Status;
+import io.grpc.StatusRuntimeException;
+import com.google.common.util.concurrent.ListenableFuture;
 
-import java.util.UUID;
+import java.time.Duration;
+import java.time.Instant;
+import java.util.ArrayList;
+import java.util.List;
+import java.util.concurrent.ExecutionException;
+import java.util.concurrent.TimeUnit;
 import java.util.logging.Logger;
 import java.util.Properties;
 import java.io.FileInputStream;
 import java.io.IOException;
 
-public class WorkflowBatchActivitiesImpl implements WorkflowBatchActivities {
+public class WorkflowBatchActivitiesImpl implements WorkflowBatchActivities, AutoCloseable {
 
     private static final Logger logger = Logger.getLogger(WorkflowBatchActivitiesImpl.class.getName());
 
-    @Override
-    public void batchCancelWorkflows() {
+    // Partitions are spaced over this window when the caller doesn't pass a lower bound; the first one is open-ended anyway
+    private static final Duration DEFAULT_LOOKBACK = Duration.ofHours(24);
+
+    // Connection to the main namespace, created on first use and kept for the worker's lifetime
+    private WorkflowServiceStubs service;
+    private String namespace;
+
+    private synchronized WorkflowServiceStubs getService() {
+        if (service != null) {
+            return service;
+        }
         // ---- Load API key from .env (same as worker) ----
         Properties props = new Properties();
         try (FileInputStream fis = new FileInputStream(".env")) {
@@ -42,44 +57,111 @@ public class WorkflowBatchActivitiesImpl implements WorkflowBatchActivities {
         if (address == null || address.isBlank()){
             address = "us-east-1.aws.api.temporal.io:7233";
         }
-        String namespace = props.getProperty("TEMPORAL_MAIN_NAMESPACE");
-        if (namespace==null || namespace.isBlank()){
+        String ns = props.getProperty("TEMPORAL_MAIN_NAMESPACE");
+        if (ns==null || ns.isBlank()){
             throw new RuntimeException("Temporal namespace not found in .env");
         }
 
-        WorkflowServiceStubsOptions serviceOptions = 
+        WorkflowServiceStubsOptions serviceOptions =
             WorkflowServiceStubsOptions.newBuilder()
                 .setTarget(address)
                 .setEnableHttps(true)
                 .addApiKey(() -> apiKey)
                 .build();
-        
-        WorkflowServiceStubs service = WorkflowServiceStubs.newServiceStubs(serviceOptions);
-        WorkflowClient client = WorkflowClient.newInstance(
-            service,
-            WorkflowClientOptions.newBuilder()
-                .setNamespace(namespace)
-                .build()
-            );
 
-        try {
-            // Build request
-            StartBatchOperationRequest request = StartBatchOperationRequest.newBuilder()
-                .setNamespace(namespace)
-                .setVisibilityQuery("WorkloadId = \"1\" AND ExecutionStatus = \"Running\"")
-                .setJobId(UUID.randomUUID().toString())
-                .setReason("Runaway Train")
-                .setTerminationOperation(BatchOperationTermination.newBuilder().build()) //Choose between cancelation or termination as appropriate
-                .build();
+        namespace = ns;
+        service = WorkflowServiceStubs.newServiceStubs(serviceOptions);
+        return service;
+    }
 
-            // Send request via gRPC stub
-            StartBatchOperationResponse response = client.getWorkflowServiceStubs().blockingStub().startBatchOperation(request);
+    @Override
+    public List<String> batchCancelWorkflows(String target, boolean terminate, int partitions, String since, List<String> bounds) {
+        WorkflowServiceStubs stubs = getService();
+        String baseQuery = "(" + target + ") AND ExecutionStatus = \"Running\"";
+
+        // Job IDs derive from the run and the activity, so a retried attempt finds the jobs it already started instead of
+        // duplicating them, and no other run of the workflow ID (after continue-as-new or a restart) can collide with them
+        ActivityInfo info = Activity.getExecutionContext().getInfo();
+        String jobPrefix = info.getWorkflowId() + "-" + info.getRunId() + "-" + info.getActivityId();
+        // The reason names the run as well, so an existing job can be checked before it is treated as ours
+        String reason = "Runaway Train: " + info.getWorkflowId() + "/" + info.getRunId();
+
+        List<String> cuts = new ArrayList<>();
+        if (bounds != null && !bounds.isEmpty()) {
+            cuts.addAll(bounds);
+        } else if (partitions > 1) {
+            Instant end = Instant.now();
+            Instant start = since == null || since.isBlank() ? end.minus(DEFAULT_LOOKBACK) : Instant.parse(since);
+            Duration step = Duration.between(start, end).dividedBy(partitions);
+            for (int i = 1; i < partitions; i++) {
+                cuts.add(start.plus(step.multipliedBy(i)).toString());
+            }
+        }
+
+        // Disjoint StartTime ranges; the first and last are open-ended so nothing falls outside them
+        List<String> queries = new ArrayList<>();
+        for (int i = 0; i <= cuts.size(); i++) {
+            StringBuilder query = new StringBuilder(baseQuery);
+            if (i > 0) {
+                query.append(" AND StartTime >= \"").append(cuts.get(i - 1)).append("\"");
+            }
+            if (i < cuts.size()) {
+                query.append(" AND StartTime < \"").append(cuts.get(i)).append("\"");
+            }
+            queries.add(query.toString());
+        }
 
-            logger.info("Batch cancel response: " + response);
+        // Start every job before waiting on any of them
+        List<String> jobIds = new ArrayList<>();
+        List<ListenableFuture<StartBatchOperationResponse>> responses = new ArrayList<>();
+        for (int i = 0; i < queries.size(); i++) {
+            String jobId = queries.size() == 1 ? jobPrefix : jobPrefix + "-" + i;
+            StartBatchOperationRequest.Builder request = StartBatchOperationRequest.newBuilder()
+                .setNamespace(namespace)
+                .setVisibilityQuery(queries.get(i))
+                .setJobId(jobId)
+                .setReason(reason);
+            if (terminate) {
+                request.setTerminationOperation(BatchOperationTermination.newBuilder().build());
+            } else {
+                request.setCancellationOperation(BatchOperationCancellation.newBuilder().build());
+            }
+            jobIds.add(jobId);
+            responses.add(stubs.futureStub().startBatchOperation(request.build()));
+        }
+
+        for (int i = 0; i < responses.size(); i++) {
+            try {
+                responses.get(i).get();
+                logger.info("Started batch job " + jobIds.get(i) + " for: " + queries.get(i));
+            } catch (ExecutionException e) {
+                if (e.getCause() instanceof StatusRuntimeException
+                        && ((StatusRuntimeException) e.getCause()).getStatus().getCode() == Status.Code.ALREADY_EXISTS) {
+                    DescribeBatchOperationResponse existing = stubs.blockingStub().describeBatchOperation(
+                        DescribeBatchOperationRequest.newBuilder().setNamespace(namespace).setJobId(jobIds.get(i)).build());
+                    if (reason.equals(existing.getReason())) {
+                        logger.info("Batch job " + jobIds.get(i) + " already started by an earlier attempt");
+                        continue;
+                    }
+                    throw ApplicationFailure.newNonRetryableFailure(
+                        "Batch job " + jobIds.get(i) + " already exists for another run: " + existing.getReason(), "BatchJobConflict");
+                }
+                logger.severe("Batch cancel failed: " + e.getCause().getMessage());
+                throw Activity.wrap(e.getCause());
+            } catch (InterruptedException e) {
+                Thread.currentThread().interrupt();
+                throw Activity.wrap(e);
+            }
+        }
+        return jobIds;
+    }
 
-        } catch (Exception e) {
-            logger.severe("Batch cancel failed: " + e.getMessage());
-            e.printStackTrace();
+    @Override
+    public synchronized void close() {
+        if (service != null) {
+            service.shutdown();
+            service.awaitTermination(10, TimeUnit.SECONDS);
+            service = null;
         }
     }
-}
\ No newline at end of file
+}
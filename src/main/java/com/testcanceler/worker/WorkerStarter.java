@@ -64,7 +64,8 @@ public class WorkerStarter {
         Worker worker = factory.newWorker("batch-queue");
 
         // Register your workflow and activities
-        worker.registerActivitiesImplementations(new WorkflowBatchActivitiesImpl());
+        WorkflowBatchActivitiesImpl batchActivities = new WorkflowBatchActivitiesImpl();
+        worker.registerActivitiesImplementations(batchActivities);
 
         // Configure advanced options (like max concurrency) using WorkerOptions if desired
         // e.g. WorkerOptions.newBuilder().setMaxConcurrentWorkflowTaskExecutionSize(1000).build();
@@ -72,6 +73,13 @@ public class WorkerStarter {
         // Start polling
         factory.start();
 
+        // Stop polling and release the batch activity's connection on Ctrl+C
+        Runtime.getRuntime().addShutdownHook(new Thread(() -> {
+            factory.shutdown();
+            factory.awaitTermination(10, java.util.concurrent.TimeUnit.SECONDS);
+            batchActivities.close();
+        }));
+
         System.out.println("✅ Worker started for task queue: batch-queue");
         System.out.println("Press Ctrl+C to stop...");
 
@@ -16,6 +16,7 @@ TEMPORAL_MAIN_TASK_QUEUE=os.getenv('TEMPORAL_MAIN_TASK_QUEUE')
 TEMPORAL_CANCELER_TASK_QUEUE=os.getenv('TEMPORAL_CANCELER_TASK_QUEUE')
 TEMPORAL_MAIN_ADDRESS=os.getenv("TEMPORAL_MAIN_ADDRESS", "us-east-1.aws.api.temporal.io:7233")
 TEMPORAL_CANCELER_ADDRESS = os.getenv("TEMPORAL_CANCELER_ADDRESS", "us-east-1.aws.api.temporal.io:7233")
+TEMPORAL_TLS = os.getenv("TEMPORAL_TLS", "true").lower() == "true"  # false for a local dev server, e.g. bench_cancel.py
 
 #Target Jobs
 WORKLOAD_ID = 1 #Target search attribute value
@@ -25,6 +26,25 @@ PARENT_CLOSE_POLICY = ParentClosePolicy.TERMINATE  # Consider ABANDON/REQUEST_CA
 CHILD_SPAWN_SEMAPHORE = 100
 WORKLOAD_ID_ATTR_NAME = "WorkloadId"
 WORKLOAD_ID_VALUE = "1"
+# Continue-as-new for CancelableWorkflow. Closing a run applies the parent close policy, so while this is on the
+# parent starts its direct children with ABANDON instead of PARENT_CLOSE_POLICY to keep them alive across runs.
+# run.py passes these to the workflow as SpawnSettings; workflow code never reads them itself.
+SPAWN_CONTINUE_AS_NEW = os.getenv("SPAWN_CONTINUE_AS_NEW", "false").lower() == "true"  # true starts direct children with ABANDON
+SPAWN_CONTINUE_AS_NEW_EVENTS = int(os.getenv("SPAWN_CONTINUE_AS_NEW_EVENTS", "10000"))
+SPAWN_CHUNK = 500  # children started between continue-as-new checks
+# Tree shape defaults (run.py flags override them): root -> executions children -> SPAWN_WIDTH per node below that
+SPAWN_WIDTH = int(os.getenv("SPAWN_WIDTH", "500"))
+SPAWN_DEPTH = int(os.getenv("SPAWN_DEPTH", "2"))  # levels below the root
+# Fast mode derives child IDs from workflow.uuid4() instead of running a generate_uuid activity per child
+SPAWN_FAST_IDS = os.getenv("SPAWN_FAST_IDS", "false").lower() == "true"
+# Cascade cancel: signals in flight per node, and how long a node waits for its children to close before it closes
+CANCEL_FANOUT = int(os.getenv("CANCEL_FANOUT", "50"))
+CANCEL_DRAIN_TIMEOUT = timedelta(seconds=int(os.getenv("CANCEL_DRAIN_SECONDS", "30")))
+
+# Telemetry: SDK metrics go to a Prometheus scrape endpoint or, if that's unset, an OTLP collector
+WORK_PROMETHEUS_ADDRESS = os.getenv("WORK_PROMETHEUS_ADDRESS")  # e.g. 0.0.0.0:9465
+OTEL_METRICS_URL = os.getenv("OTEL_METRICS_URL")  # e.g. http://localhost:4317
+TRACING = os.getenv("TRACING", "false").lower() == "true"  # OpenTelemetry spans, needs temporalio[opentelemetry]
 
 # Timeouts & polling defaults
 QUERY_TIMEOUT = timedelta(minutes=10)
@@ -0,0 +1,23 @@
+import asyncio
+from temporalio.client import Client
+from workflow import CancelableWorkflow
+from config import TEMPORAL_MAIN_API_KEY, TEMPORAL_MAIN_ADDRESS, TEMPORAL_MAIN_NAMESPACE, TEMPORAL_TLS
+
+#Use this script to stop the spawning workflow tree from growing, e.g. right before starting the canceler.
+async def main() -> None:
+    # Connect to Temporal server
+    client = await Client.connect(
+        TEMPORAL_MAIN_ADDRESS,
+        namespace=TEMPORAL_MAIN_NAMESPACE,
+        api_key=TEMPORAL_MAIN_API_KEY,
+        tls=TEMPORAL_TLS
+    )
+
+    workflow_id = f"cancelable-workflow"
+    handle = client.get_workflow_handle_for(CancelableWorkflow.run, workflow_id)
+    never_started = await handle.execute_update(CancelableWorkflow.freeze)
+    print(f"Froze {workflow_id}: {never_started} direct children were never started")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
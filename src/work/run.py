@@ -1,16 +1,25 @@
 import os
+import argparse
 import asyncio
 from temporalio.client import Client
-from workflow import CancelableWorkflow
+from workflow import CancelableWorkflow, spawn_settings
 from temporalio.common import (
     TypedSearchAttributes,
     SearchAttributeKey,
     SearchAttributePair,
 )
-from config import TEMPORAL_MAIN_API_KEY, TEMPORAL_MAIN_ADDRESS, TEMPORAL_MAIN_NAMESPACE, TEMPORAL_MAIN_TASK_QUEUE
+from config import TEMPORAL_MAIN_API_KEY, TEMPORAL_MAIN_ADDRESS, TEMPORAL_MAIN_NAMESPACE, TEMPORAL_MAIN_TASK_QUEUE, TEMPORAL_TLS
+from config import CHILD_SPAWN_SEMAPHORE, SPAWN_WIDTH, SPAWN_DEPTH, SPAWN_FAST_IDS
 
 #Use this script to kick off a spawning workflow. 
 async def main() -> None:
+    parser = argparse.ArgumentParser(description="Start a CancelableWorkflow tree")
+    parser.add_argument("--executions", type=int, default=2000, help="direct children of the root")
+    parser.add_argument("--width", type=int, default=SPAWN_WIDTH, help="children per node below the root's children")
+    parser.add_argument("--depth", type=int, default=SPAWN_DEPTH, help="levels below the root")
+    parser.add_argument("--concurrency", type=int, default=CHILD_SPAWN_SEMAPHORE, help="child starts in flight per node")
+    parser.add_argument("--fast", action="store_true", default=SPAWN_FAST_IDS, help="workflow.uuid4() IDs instead of a generate_uuid activity per child")
+    args = parser.parse_args()
     interrupt_event = asyncio.Event()
 
     search_attributes = TypedSearchAttributes([SearchAttributePair(SearchAttributeKey.for_keyword("WorkloadId"), "1")])
@@ -20,14 +29,14 @@ async def main() -> None:
         TEMPORAL_MAIN_ADDRESS,
         namespace=TEMPORAL_MAIN_NAMESPACE,
         api_key=TEMPORAL_MAIN_API_KEY,
-        tls=True
+        tls=TEMPORAL_TLS
     )
 
     # Start the CancelableWorkflow;
     workflow_id = f"cancelable-workflow"
     handle = await client.start_workflow(
         CancelableWorkflow.run, 
-        2000,
+        args=[args.executions, None, args.width, args.depth, args.concurrency, args.fast, spawn_settings()],
         id=workflow_id,
         search_attributes=search_attributes,
         task_queue=TEMPORAL_MAIN_TASK_QUEUE,
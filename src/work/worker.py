@@ -1,12 +1,21 @@
 from __future__ import annotations
+from typing import Optional
 import os
 import logging
 import asyncio
 from temporalio.client import Client
 from temporalio.worker import Worker
+from temporalio.runtime import Runtime, TelemetryConfig, PrometheusConfig, OpenTelemetryConfig
 from workflow import CancelableWorkflow, ChildWorkflow
 from activity import generate_uuid
-from config import TEMPORAL_MAIN_NAMESPACE, TEMPORAL_MAIN_ADDRESS, TEMPORAL_MAIN_API_KEY, TEMPORAL_MAIN_TASK_QUEUE
+from config import TEMPORAL_MAIN_NAMESPACE, TEMPORAL_MAIN_ADDRESS, TEMPORAL_MAIN_API_KEY, TEMPORAL_MAIN_TASK_QUEUE, TEMPORAL_TLS
+from config import WORK_PROMETHEUS_ADDRESS, OTEL_METRICS_URL, TRACING
+_tracing_interceptor: Optional[type]
+try:
+    from temporalio.contrib.opentelemetry import TracingInterceptor  # optional: pip install "temporalio[opentelemetry]"
+    _tracing_interceptor = TracingInterceptor
+except ImportError:  # pragma: no cover - depends on the environment
+    _tracing_interceptor = None
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s [%(levelname)s] %(name)s: %(message)s"
@@ -14,6 +23,14 @@ logging.basicConfig(
 
 interrupt_event = asyncio.Event()
 
+def _runtime() -> Runtime:
+    # SDK metrics (workflow task latency, sticky cache, start-child and signal counts) for the spawning workers
+    if WORK_PROMETHEUS_ADDRESS:
+        return Runtime(telemetry=TelemetryConfig(metrics=PrometheusConfig(bind_address=WORK_PROMETHEUS_ADDRESS), global_tags={"service": "work"}))
+    if OTEL_METRICS_URL:
+        return Runtime(telemetry=TelemetryConfig(metrics=OpenTelemetryConfig(url=OTEL_METRICS_URL), global_tags={"service": "work"}))
+    return Runtime.default()
+
 async def main():
     # Connect to Temporal Server. Change address to yoru appropriate address.
     # Initialize client connection
@@ -21,7 +38,9 @@ async def main():
         TEMPORAL_MAIN_ADDRESS,
         namespace=TEMPORAL_MAIN_NAMESPACE,
         api_key=TEMPORAL_MAIN_API_KEY,
-        tls=True,
+        tls=TEMPORAL_TLS,
+        runtime=_runtime(),
+        interceptors=[_tracing_interceptor()] if TRACING and _tracing_interceptor is not None else [],
     )
 
     print("Starting worker process...")
@@ -5,11 +5,108 @@ from temporalio.common import (
     SearchAttributeKey,
     SearchAttributePair,
 )
+from dataclasses import dataclass, field
 from datetime import timedelta
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Set
 import asyncio
 from activity import generate_uuid
 
 from config import PARENT_CLOSE_POLICY, CHILD_SPAWN_SEMAPHORE, WORKLOAD_ID_ATTR_NAME, WORKLOAD_ID_VALUE, TEMPORAL_MAIN_TASK_QUEUE
+from config import SPAWN_CONTINUE_AS_NEW, SPAWN_CONTINUE_AS_NEW_EVENTS, SPAWN_CHUNK
+from config import CANCEL_FANOUT, CANCEL_DRAIN_TIMEOUT
+
+async def _child_id(fast_ids: bool) -> str:
+    """Workflow ID for a new child. Fast mode uses the workflow's deterministic uuid4 and skips the activity round trip."""
+    if fast_ids:
+        return f"workflow-{workflow.uuid4()}"
+    wfid = await workflow.execute_activity(
+        generate_uuid, start_to_close_timeout=timedelta(seconds=60)
+    )
+    return f"workflow-{wfid}"
+
+async def _signal_all(targets: List[Any], signal: Callable, fanout: int) -> None:
+    """Signal child or external workflow handles with at most `fanout` signals in flight."""
+    sem = asyncio.Semaphore(fanout)
+
+    async def one(target: Any) -> None:
+        async with sem:
+            try:
+                await target.signal(signal)
+            except Exception:
+                # Intentionally ignore, e.g. if the child already closed
+                pass
+
+    await asyncio.gather(*[one(t) for t in targets])
+
+async def _wait_or_cancelled(done: Callable[[], bool], cancelled: Callable[[], bool], timeout: Optional[timedelta] = None) -> None:
+    """Wait until done() or cancelled() is true, or the timeout passes, whichever comes first."""
+    try:
+        await workflow.wait_condition(lambda: done() or cancelled(), timeout=timeout)
+    except asyncio.TimeoutError:
+        pass
+
+async def _close_after_cascade(children: List[workflow.ChildWorkflowHandle], drain_seconds: float) -> None:
+    """Let the cancel handler finish signalling, then give the children up to drain_seconds to close before this node does."""
+    await workflow.wait_condition(workflow.all_handlers_finished)
+    await _wait_or_cancelled(lambda: all(h.done() for h in children), lambda: False, timedelta(seconds=drain_seconds))
+
+class _SpawnTracker:
+    """The _start_one tasks of one workflow, so a freeze can stop the ones that haven't issued their child start yet."""
+
+    def __init__(self) -> None:
+        self.frozen: bool = False
+        self.tasks: Dict[int, asyncio.Task] = {}
+        self.starting: Set[int] = set()  # start command already issued; left to finish when frozen
+
+    async def run(self, ns: range, start: Callable[[int], Coroutine[Any, Any, Any]]) -> None:
+        """Run start(n) for every n concurrently, until done or frozen."""
+        if self.frozen:
+            return
+        for n in ns:
+            self.tasks[n] = asyncio.create_task(start(n))
+        results = await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+        self.tasks.clear()
+        self.starting.clear()
+        for result in results:
+            if isinstance(result, BaseException) and not isinstance(result, asyncio.CancelledError):
+                raise result
+
+    async def freeze(self) -> None:
+        """Cancel every start still waiting on the semaphore or its ID, and wait for the in-flight ones."""
+        self.frozen = True
+        for n, task in self.tasks.items():
+            if n not in self.starting:
+                task.cancel()
+        await workflow.wait_condition(lambda: not self.tasks)
+
+@dataclass
+class SpawnSettings:
+    """Tuning the spawn tree branches on. It is a run argument of every node, carried through continue-as-new in SpawnState,
+    so every worker replays a tree the same way whatever its environment; spawn_settings() reads it from config.py."""
+    continue_as_new: bool = False  # start direct children with ABANDON and continue as new between chunks
+    continue_as_new_events: int = 10000
+    chunk: int = 500  # children started between continue-as-new checks
+    # Cascade cancel, passed down to every ChildWorkflow: signals in flight per node, and how long a node waits for its
+    # children to close before it closes
+    cancel_fanout: int = 50
+    drain_seconds: float = 30.0
+
+def spawn_settings() -> SpawnSettings:
+    """The workflow tuning from config.py, for the starter to pass to CancelableWorkflow.run."""
+    return SpawnSettings(
+        continue_as_new=SPAWN_CONTINUE_AS_NEW,
+        continue_as_new_events=SPAWN_CONTINUE_AS_NEW_EVENTS,
+        chunk=SPAWN_CHUNK,
+        cancel_fanout=CANCEL_FANOUT,
+        drain_seconds=CANCEL_DRAIN_TIMEOUT.total_seconds(),
+    )
+
+@dataclass
+class SpawnState:
+    """Spawn progress CancelableWorkflow carries across continue-as-new."""
+    started: int = 0
+    child_ids: List[str] = field(default_factory=list)  # direct children started by earlier runs, for the cancel signal
+    settings: SpawnSettings = field(default_factory=SpawnSettings)
 
 # ------------------------------- Parent ------------------------------------
 @workflow.defn
@@ -17,7 +114,10 @@ class CancelableWorkflow:
     """Launch a batch of child workflows and wait for them to close.
 
     Signals:
-        cancel: Emergency cancel that cascades to direct children.
+        cancel: Cooperative cancel that cascades down the tree; every node stops spawning, passes it on and closes.
+
+    Updates:
+        freeze: Stop spawning anywhere in the tree; returns how many direct children were never started.
     """
 
     def __init__(self) -> None:
@@ -27,6 +127,17 @@ class CancelableWorkflow:
         self.children: list[workflow.ChildWorkflowHandle] = []
         self.sem = asyncio.Semaphore(CHILD_SPAWN_SEMAPHORE)
         self.workload_id_key = SearchAttributeKey.for_keyword(WORKLOAD_ID_ATTR_NAME)
+        # Tree shape, set from run()
+        self.width: int = 500
+        self.depth: int = 2
+        self.concurrency: int = CHILD_SPAWN_SEMAPHORE
+        self.fast_ids: bool = False
+        self.settings = SpawnSettings()
+        self.executions: int = 0
+        self.spawner = _SpawnTracker()
+        # Continue-as-new state
+        self.started: int = 0
+        self.earlier_child_ids: list[str] = []
 
     # ---- helpers ----
     @staticmethod
@@ -42,34 +153,63 @@ class CancelableWorkflow:
         """Start a single child workflow with concurrency control."""
         async with self.sem:
 
-            # Generate a unique workflow id via activity
-            wfid = await workflow.execute_activity(
-                generate_uuid, start_to_close_timeout=timedelta(seconds=60)
-            )
+            # Generate a unique workflow id
+            wfid = await _child_id(self.fast_ids)
 
-            # Start the child
+            # Start the child; from here on a freeze lets it finish
+            self.spawner.starting.add(n)
             handle = await workflow.start_child_workflow(
                 ChildWorkflow.run,
-                args=(n, spawn),
-                id=f"workflow-{wfid}",
+                args=(n, spawn, self.width, self.depth - 1, self.concurrency, self.fast_ids, self.settings),
+                id=wfid,
                 task_queue=TEMPORAL_MAIN_TASK_QUEUE,
                 search_attributes=search_attributes,
-                parent_close_policy=PARENT_CLOSE_POLICY,
+                parent_close_policy=ParentClosePolicy.ABANDON if self.settings.continue_as_new else PARENT_CLOSE_POLICY,
             )
             
             workflow.logger.info(f"Started child workflow {n} -> {handle.id}")
             self.children.append(handle)
             return handle
 
-    async def _backup_cancel_by_index(self, idx: int) -> None:
-        """Emergency cancel of a direct child via signal (no parent cancel)."""
-        child = self.children[idx]
-        await child.signal(ChildWorkflow.cancel)
+    async def _signal_children(self, signal: Callable) -> None:
+        """Signal every direct child, including those started by earlier runs."""
+        await _signal_all(
+            [*self.children, *[workflow.get_external_workflow_handle(wid) for wid in self.earlier_child_ids]],
+            signal,
+            self.settings.cancel_fanout,
+        )
+
+    async def _checkpoint(self, executions: int) -> None:
+        """Continue as new once history is getting long, carrying the spawn progress."""
+        if not self.settings.continue_as_new:
+            return
+        info = workflow.info()
+        if info.is_continue_as_new_suggested() or info.get_current_history_length() >= self.settings.continue_as_new_events:
+            await workflow.wait_condition(workflow.all_handlers_finished)
+            if self.spawner.frozen:
+                return  # nothing more to spawn, so no need for a fresh history
+            workflow.logger.info(f"Continuing as new after starting {self.started}/{executions} children")
+            workflow.continue_as_new(args=[
+                executions,
+                SpawnState(self.started, self.earlier_child_ids + [h.id for h in self.children], self.settings),
+                self.width, self.depth, self.concurrency, self.fast_ids,
+            ])
 
     # ---- entrypoints ----
     @workflow.run
-    async def run(self, executions: int = 2000) -> None:
+    async def run(self, executions: int = 2000, state: Optional[SpawnState] = None, width: int = 500,
+                  depth: int = 2, concurrency: int = CHILD_SPAWN_SEMAPHORE, fast_ids: bool = False,
+                  settings: Optional[SpawnSettings] = None) -> None:
+        """Spawn `executions` children; below them each node spawns `width` more, down to `depth` levels below the root."""
+        # Defaults here are code constants rather than config.py's environment: run.py passes those explicitly
         workflow.logger.info("Starting parent workflow...")
+        self.executions = executions
+        self.width, self.depth, self.concurrency, self.fast_ids = width, depth, concurrency, fast_ids
+        self.settings = settings or SpawnSettings()
+        self.sem = asyncio.Semaphore(concurrency)
+        if state is not None:
+            # Continued as new part way through spawning
+            self.started, self.earlier_child_ids, self.settings = state.started, list(state.child_ids), state.settings
         
         # Create search attributes for spawning
         search_attributes = TypedSearchAttributes([SearchAttributePair(self.workload_id_key, WORKLOAD_ID_VALUE)])
@@ -77,29 +217,45 @@ class CancelableWorkflow:
 
         while not self._cancelled:
             if self.spawn:
-                # Launch children
-                await asyncio.gather(*[self._start_one(n, True, search_attributes) for n in range(executions)])
+                # Launch children, in chunks when the history may need to be cut between them
+                chunk = self.settings.chunk if self.settings.continue_as_new else executions
+                while self.started < executions and not self._cancelled and not self.spawner.frozen:
+                    end = min(executions, self.started + chunk)
+                    await self.spawner.run(range(self.started, end), lambda n: self._start_one(n, depth > 1, search_attributes))
+                    self.started = end
+                    await self._checkpoint(executions)
 
-                # Wait for all to finish/close
-                await asyncio.gather(
+                # Wait for all to finish/close, or for a cancel
+                closed = asyncio.ensure_future(asyncio.gather(
                     *[self._wait_closed(h) for h in self.children],
                     return_exceptions=True,
-                )
+                ))
+                await _wait_or_cancelled(closed.done, lambda: self._cancelled)
                 self.spawn = False
                 workflow.logger.info("Finishing workflow spawning...") 
+            if self._cancelled:
+                break
             workflow.logger.info("Completed child workflows. Workflow waiting…")
-            await workflow.sleep(timedelta(minutes=30))
+            await _wait_or_cancelled(lambda: False, lambda: self._cancelled, timedelta(minutes=30))
 
+        await _close_after_cascade(self.children, self.settings.drain_seconds)
         workflow.logger.info("Parent workflow cancelled.")
 
     @workflow.signal
     async def cancel(self) -> None:
-        # Send cancel signal to each direct child as an emergency cancel. Used during early testing.
-        await asyncio.gather(
-            *[self._backup_cancel_by_index(i) for i in range(len(self.children))],
-            return_exceptions=True,
-        )
+        # Wake the run loop, stop spawning, then pass the cancel down; each child does the same for its own children
         self._cancelled = True
+        await self.spawner.freeze()
+        await self._signal_children(ChildWorkflow.cancel)
+
+    @workflow.update
+    async def freeze(self) -> int:
+        # Stop starting children here, then pass the freeze down so every level stops growing
+        await self.spawner.freeze()
+        await self._signal_children(ChildWorkflow.freeze)
+        never_started = self.executions - len(self.earlier_child_ids) - len(self.children)
+        workflow.logger.info(f"Spawning frozen; {never_started} children never started")
+        return never_started
         
 
 
@@ -115,17 +271,23 @@ class ChildWorkflow:
         self.children: list[workflow.ChildWorkflowHandle] = []
         self.sem = asyncio.Semaphore(CHILD_SPAWN_SEMAPHORE)
         self.workload_id_key = SearchAttributeKey.for_keyword(WORKLOAD_ID_ATTR_NAME)
+        # Tree shape, set from run()
+        self.width: int = 500
+        self.levels: int = 1
+        self.concurrency: int = CHILD_SPAWN_SEMAPHORE
+        self.fast_ids: bool = False
+        self.settings = SpawnSettings()
+        self.spawner = _SpawnTracker()
 
     async def _start_one(self, n: int, spawn: bool = False, search_attributes = None) -> workflow.ChildWorkflowHandle:
         """Start a grandchild workflow with concurrency control."""
         async with self.sem:
-            wfid = await workflow.execute_activity(
-                generate_uuid, start_to_close_timeout=timedelta(seconds=60)
-            )
+            wfid = await _child_id(self.fast_ids)
+            self.spawner.starting.add(n)
             handle = await workflow.start_child_workflow(
                 ChildWorkflow.run,
-                args=(n, spawn),
-                id=f"workflow-{wfid}",
+                args=(n, spawn, self.width, self.levels - 1, self.concurrency, self.fast_ids, self.settings),
+                id=wfid,
                 task_queue=TEMPORAL_MAIN_TASK_QUEUE,
                 search_attributes=search_attributes,
                 parent_close_policy=PARENT_CLOSE_POLICY,
@@ -135,8 +297,13 @@ class ChildWorkflow:
             return handle
 
     @workflow.run
-    async def run(self, id: int, spawn: bool) -> None:
+    async def run(self, id: int, spawn: bool, width: int = 500, levels: int = 1, concurrency: int = CHILD_SPAWN_SEMAPHORE,
+                  fast_ids: bool = False, settings: Optional[SpawnSettings] = None) -> None:
+        """If spawn, start `width` children, which spawn in turn while `levels` below this node remain."""
         self.id = id
+        self.width, self.levels, self.concurrency, self.fast_ids = width, levels, concurrency, fast_ids
+        self.settings = settings or SpawnSettings()
+        self.sem = asyncio.Semaphore(concurrency)
         workflow.logger.info(f"Child workflow {self.id} started.")
 
         # Create search attributes for spawning
@@ -146,17 +313,30 @@ class ChildWorkflow:
             self.spawn = spawn
             if self.spawn:
                 # Launch grandchildren and wait for their completion/closure
-                await asyncio.gather(*[self._start_one(n, False, search_attributes) for n in range(500)])
-                await asyncio.gather(
+                await self.spawner.run(range(width), lambda n: self._start_one(n, levels > 1, search_attributes))
+                closed = asyncio.ensure_future(asyncio.gather(
                     *[CancelableWorkflow._wait_closed(h) for h in self.children],
                     return_exceptions=True,
-                )
+                ))
+                await _wait_or_cancelled(closed.done, lambda: self._cancelled)
                 self.spawn = False
             else:
                 workflow.logger.info("Spawning complete, workflow waiting…")
-                await workflow.sleep(timedelta(minutes=30))
+                await _wait_or_cancelled(lambda: False, lambda: self._cancelled, timedelta(minutes=30))
+
+        await _close_after_cascade(self.children, self.settings.drain_seconds)
 
     @workflow.signal
-    def cancel(self) -> None:
+    async def cancel(self) -> None:
         self._cancelled = True
         workflow.logger.info(f"Child workflow {self.id} received cancel signal.")
+        await self.spawner.freeze()
+        await _signal_all(self.children, ChildWorkflow.cancel, self.settings.cancel_fanout)
+
+    @workflow.signal
+    async def freeze(self) -> None:
+        # Stop starting grandchildren, then pass the freeze on to the ones already started
+        await self.spawner.freeze()
+        await _signal_all(self.children, ChildWorkflow.freeze, self.settings.cancel_fanout)
+        if self.spawn:
+            workflow.logger.info(f"[child {self.id}] spawning frozen; {self.width - len(self.children)} never started")
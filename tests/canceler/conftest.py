@@ -0,0 +1,75 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Tuple
+
+import pytest
+
+import workflow as workflow_module
+
+
+class FakeWorkflowAPI:
+    """Stands in for temporalio.workflow inside workflow.py, so workflow methods run as plain coroutines.
+
+    Activities are looked up by name in `activities` and called with their positional args; every call is recorded
+    in `calls`. The clock only moves when the workflow sleeps, by the timeout it sleeps for.
+    """
+
+    def __init__(self):
+        self.activities: Dict[str, Callable[..., Any]] = {}
+        self.calls: List[Tuple[str, tuple]] = []
+        self.clock = datetime(2024, 6, 1, tzinfo=timezone.utc)
+        self.logger = logging.getLogger("fake-workflow")
+        self.history_length = 0
+
+    def names(self) -> List[str]:
+        return [name for name, _ in self.calls]
+
+    async def _call(self, name: str, arg: Any = None, *, args: tuple = (), **options: Any) -> Any:
+        args = tuple(args) if args else (() if arg is None else (arg,))
+        self.calls.append((name, args))
+        result = self.activities[name](*args)
+        return await result if asyncio.iscoroutine(result) else result
+
+    execute_activity = _call
+    execute_local_activity = _call
+
+    def start_activity(self, name: str, arg: Any = None, *, args: tuple = (), **options: Any) -> "asyncio.Task[Any]":
+        return asyncio.ensure_future(self._call(name, arg, args=args, **options))
+
+    async def execute_child_workflow(self, *args: Any, **options: Any) -> Any:
+        raise AssertionError(f"unexpected child workflow {options.get('id')}")
+
+    def continue_as_new(self, *args: Any, **options: Any) -> None:
+        raise AssertionError("unexpected continue-as-new")
+
+    def now(self) -> datetime:
+        return self.clock
+
+    def info(self) -> SimpleNamespace:
+        return SimpleNamespace(
+            workflow_id="bulk-cancel",
+            is_continue_as_new_suggested=lambda: False,
+            get_current_history_length=lambda: self.history_length,
+            get_current_history_size=lambda: 0,
+        )
+
+    @staticmethod
+    def all_handlers_finished() -> bool:
+        return True
+
+    async def wait_condition(self, condition: Callable[[], bool], timeout: Any = None) -> None:
+        if condition():
+            return
+        if timeout is None:
+            raise AssertionError("workflow would wait forever")
+        self.clock += timeout if isinstance(timeout, timedelta) else timedelta(seconds=timeout)
+        raise asyncio.TimeoutError()
+
+
+@pytest.fixture
+def fake_workflow(monkeypatch) -> FakeWorkflowAPI:
+    fake = FakeWorkflowAPI()
+    monkeypatch.setattr(workflow_module, "workflow", fake)
+    return fake
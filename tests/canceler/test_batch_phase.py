@@ -0,0 +1,56 @@
+import asyncio
+
+from config import STRATEGY_BATCH
+from models import EPOCH, BatchProgress, ConfirmResult, ShardResult, TerminateSummary, WorkflowPage, visibility_time
+from workflow import BulkCancelWorkflow, PHASE_CLEANUP
+
+SPAWNED = "2024-06-01T00:00:01.000Z"
+
+
+def _cluster(fake, tracks):
+    """One batch job whose progress comes from tracks, two workflows spawned after it started, then nothing."""
+    pages = [WorkflowPage(workflow_ids=["late-0", "late-1"], run_ids=["r0", "r1"], latest_start_time=SPAWNED, latest_ids=["late-1"])]
+    fake.activities.update({
+        "batch_cancel_workflows": lambda target, terminate, partitions, since, bounds: ["job-0"],
+        "query_wf_executions_page": lambda *args: pages.pop(0) if pages else WorkflowPage(),
+        "bulk_cancel_workflows": lambda ids, *args: TerminateSummary(terminated=len(ids)),
+        "track_batch": lambda job_ids, max_wait: tracks.pop(0),
+        "terminate_stragglers": lambda *args: ShardResult(),
+        "confirm_all_canceled": lambda target: ConfirmResult(confirmed=True),
+    })
+
+
+def _run(fake):
+    wf = BulkCancelWorkflow()
+    assert asyncio.run(wf.run(1, 5.0, 5, 1, STRATEGY_BATCH)) == "Cancelation Successful"
+    return wf
+
+
+def test_cleanup_passes_run_until_the_batch_finishes_then_confirm(fake_workflow):
+    _cluster(fake_workflow, [BatchProgress(completed=40, total=100), BatchProgress(completed=100, total=100, done=True)])
+    wf = _run(fake_workflow)
+    assert fake_workflow.names() == [
+        "batch_cancel_workflows",
+        "query_wf_executions_page", "bulk_cancel_workflows", "track_batch",
+        "terminate_stragglers", "track_batch",
+        "terminate_stragglers", "confirm_all_canceled",
+    ]
+    batch_start = visibility_time(fake_workflow.now())
+    # Cleanup lists from the batch request time, then from the newest StartTime it has seen
+    assert fake_workflow.calls[1][1][1] == batch_start
+    # After a small pass the next ones take the local round
+    assert fake_workflow.calls[4][1][1:3] == (SPAWNED, ["late-1"])
+    assert fake_workflow.calls[6][1][1:3] == (SPAWNED, ["late-1"])
+    progress = wf.progress()
+    assert progress.phase == PHASE_CLEANUP and progress.fully_canceled
+    assert progress.batch_job_ids == ["job-0"]
+    assert progress.batch_progress == BatchProgress(completed=100, total=100, done=True)
+    assert (progress.terminated, progress.passes) == (2, 3)
+
+
+def test_failed_batch_job_sweeps_every_start_time(fake_workflow):
+    _cluster(fake_workflow, [BatchProgress(completed=10, failed=90, total=100, done=True, failed_jobs=["job-0"])])
+    _run(fake_workflow)
+    assert fake_workflow.names()[-2:] == ["terminate_stragglers", "confirm_all_canceled"]
+    _, args = fake_workflow.calls[-2]
+    assert args[1:3] == (EPOCH, [])
@@ -0,0 +1,111 @@
+import asyncio
+import copy
+import dataclasses
+from types import SimpleNamespace
+
+import activity
+from activity import ALREADY_CLOSED, FAILED, TERMINATED, RETRYABLE, _terminate_once, bulk_cancel_workflows
+from client_pool import ClientPool
+from models import TerminateSummary
+from temporalio.service import RPCError, RPCStatusCode
+from temporalio.testing import ActivityEnvironment
+
+
+def _fake_terminate(attempts):
+    # Every row needs `attempts` calls, the last one succeeding; each call takes 1ms
+    calls = {}
+
+    async def terminate_once(workflow_id, run_id, summary, workload=""):
+        calls[workflow_id] = calls.get(workflow_id, 0) + 1
+        result = TERMINATED if calls[workflow_id] >= attempts else RETRYABLE
+        summary.observe(result, 0.001)
+        return result, None
+
+    return terminate_once
+
+
+def _latency_count(summary: TerminateSummary) -> int:
+    return sum(sum(counts) for counts in summary.latency_ms.values())
+
+
+def test_resume_counts_only_rows_past_the_cursor(monkeypatch):
+    monkeypatch.setattr(activity, "_terminate_once", _fake_terminate(1))
+    monkeypatch.setattr(activity, "_retry_delay", lambda attempt: 0)
+    heartbeat = TerminateSummary(terminated=2)
+    heartbeat.observe(TERMINATED, 0.001)
+    heartbeat.observe(TERMINATED, 0.001)
+    env = ActivityEnvironment()
+    env.info = dataclasses.replace(env.info, heartbeat_details=[2, dataclasses.asdict(heartbeat)])
+    summary = asyncio.run(env.run(bulk_cancel_workflows, ["a", "b", "c", "d"], ["1", "2", "3", "4"]))
+    assert summary.terminated == 4
+    assert _latency_count(summary) == 4
+
+
+def test_heartbeat_holds_only_settled_rows(monkeypatch):
+    monkeypatch.setattr(activity, "_terminate_once", _fake_terminate(2))
+    monkeypatch.setattr(activity, "_retry_delay", lambda attempt: 0)
+    env = ActivityEnvironment()
+    beats = []
+    env.on_heartbeat = lambda *details: beats.append(copy.deepcopy(details))
+    summary = asyncio.run(env.run(bulk_cancel_workflows, ["a", "b", "c"], ["1", "2", "3"]))
+    assert (summary.terminated, summary.retries, _latency_count(summary)) == (3, 3, 6)
+    for cursor, beat in beats:
+        # Two calls per row, one of them a retry, for exactly the rows below the cursor
+        assert (beat.terminated, beat.retries, _latency_count(beat)) == (cursor, cursor, 2 * cursor)
+
+
+def _fake_cluster(monkeypatch, errors):
+    """Point the client pool at a fake whose terminate raises errors[workflow_id] in turn, then succeeds."""
+    calls = []
+
+    def get_workflow_handle(workflow_id, run_id=None):
+        async def terminate():
+            calls.append((workflow_id, run_id))
+            pending = errors.get(workflow_id)
+            if pending:
+                code = pending.pop(0)
+                raise RPCError(code.name, code, b"")
+
+        return SimpleNamespace(terminate=terminate)
+
+    async def connect():
+        return SimpleNamespace(get_workflow_handle=get_workflow_handle)
+
+    monkeypatch.setattr(activity, "CLIENTS", ClientPool(1, connect))
+    monkeypatch.setattr(activity, "_retry_delay", lambda attempt: 0)
+    return calls
+
+
+def test_terminate_once_classifies_status_codes(monkeypatch):
+    _fake_cluster(monkeypatch, {
+        "gone": [RPCStatusCode.NOT_FOUND],
+        "busy": [RPCStatusCode.UNAVAILABLE],
+        "bad": [RPCStatusCode.INVALID_ARGUMENT],
+    })
+    summary = TerminateSummary()
+
+    async def scenario():
+        return [await _terminate_once(wf_id, "run", summary) for wf_id in ("ok", "gone", "busy", "bad")]
+
+    assert asyncio.run(scenario()) == [
+        (TERMINATED, None), (ALREADY_CLOSED, "NOT_FOUND"), (RETRYABLE, "UNAVAILABLE"), (FAILED, "INVALID_ARGUMENT"),
+    ]
+    assert _latency_count(summary) == 4
+
+
+def test_bulk_cancel_retries_throttled_rows_and_fails_the_rest(monkeypatch):
+    monkeypatch.setattr(activity, "TERMINATE_MAX_ATTEMPTS", 3)
+    throttled = RPCStatusCode.RESOURCE_EXHAUSTED
+    calls = _fake_cluster(monkeypatch, {
+        "gone": [RPCStatusCode.NOT_FOUND],
+        "busy": [throttled, throttled],  # succeeds on the third attempt
+        "swamped": [throttled] * 5,  # still throttled when attempts run out
+        "bad": [RPCStatusCode.INVALID_ARGUMENT],
+    })
+    ids = ["ok", "gone", "busy", "swamped", "bad"]
+    summary = asyncio.run(ActivityEnvironment().run(bulk_cancel_workflows, ids, [f"run-{i}" for i in ids]))
+    assert (summary.terminated, summary.already_closed, summary.failed) == (2, 1, 2)
+    assert summary.failed_by_status == {"RESOURCE_EXHAUSTED": 1, "INVALID_ARGUMENT": 1}
+    # Two extra attempts each for busy and swamped; bad and gone are never retried
+    assert summary.retries == 4
+    assert [calls.count((wf_id, f"run-{wf_id}")) for wf_id in ids] == [1, 1, 3, 3, 1]
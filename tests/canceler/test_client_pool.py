@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+from client_pool import ClientPool
+
+
+def _pool(size):
+    async def connect():
+        return object()
+
+    return ClientPool(size, connect)
+
+
+def test_leases_go_to_the_least_loaded_channel():
+    async def scenario():
+        pool = _pool(2)
+        async with pool.lease() as first:
+            async with pool.lease() as second:
+                assert first is not second
+                assert pool.in_flight == [1, 1]
+        assert pool.in_flight == [0, 0]
+
+    asyncio.run(scenario())
+
+
+def test_close_waits_for_open_leases_then_refuses_new_ones():
+    async def scenario():
+        pool = _pool(1)
+        released = asyncio.Event()
+
+        async def hold():
+            async with pool.lease():
+                await released.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        closing = asyncio.create_task(pool.close(timeout=5))
+        await asyncio.sleep(0.01)
+        assert not closing.done()
+        released.set()
+        await holder
+        await closing
+        with pytest.raises(RuntimeError):
+            async with pool.lease():
+                pass
+
+    asyncio.run(scenario())
+
+
+def test_close_before_first_use_returns_at_once():
+    asyncio.run(asyncio.wait_for(_pool(2).close(timeout=5), 1))
@@ -0,0 +1,63 @@
+import asyncio
+from types import SimpleNamespace
+
+from temporalio.testing import ActivityEnvironment
+
+import activity
+from activity import confirm_all_canceled
+from client_pool import ClientPool
+
+
+def _confirm(monkeypatch, counts, count_seconds=1.0):
+    """Run confirm_all_canceled against a sequence of running counts, each count call taking count_seconds on a clock
+    that otherwise only moves when the activity sleeps. Returns the result, the sleeps and the counts made."""
+    for name in ("CONFIRM_TIMEOUT_SECONDS", "CONFIRM_POLL_SECONDS", "CONFIRM_MAX_POLL_SECONDS", "CONFIRM_ZERO_STREAK", "CONFIRM_STALL_POLLS"):
+        monkeypatch.delenv(name, raising=False)
+    clock = [0.0]
+    sleeps = []
+    counts = list(counts)
+    made = []
+
+    async def count_workflows(query):
+        clock[0] += count_seconds
+        made.append(counts[0])
+        return SimpleNamespace(count=counts.pop(0) if len(counts) > 1 else counts[0])
+
+    async def connect():
+        return SimpleNamespace(count_workflows=count_workflows)
+
+    monkeypatch.setattr(activity, "CLIENTS", ClientPool(1, connect))
+    monkeypatch.setattr(activity.time, "monotonic", lambda: clock[0])
+    real_sleep = asyncio.sleep
+
+    async def sleep(seconds):
+        sleeps.append(seconds)
+        clock[0] += seconds
+        await real_sleep(0)
+
+    monkeypatch.setattr(asyncio, "sleep", sleep)
+    result = asyncio.run(ActivityEnvironment().run(confirm_all_canceled, 'WorkloadId = "1"'))
+    return result, sleeps, made
+
+
+def test_needs_a_streak_of_zero_counts(monkeypatch):
+    result, sleeps, made = _confirm(monkeypatch, [0, 0, 1, 0, 0, 0])
+    assert result.confirmed
+    assert made == [0, 0, 1, 0, 0, 0]
+
+
+def test_first_running_count_polls_at_the_base_interval(monkeypatch):
+    _, sleeps, _ = _confirm(monkeypatch, [100, 0, 0, 0])
+    assert sleeps[0] == 5.0
+
+
+def test_drop_rate_is_measured_between_counts(monkeypatch):
+    _, sleeps, _ = _confirm(monkeypatch, [100, 80, 0, 0, 0], count_seconds=1.0)
+    # 20 fewer over the 5s sleep plus the 1s count: 80 left at 20 per 6s, about 24s away
+    assert sleeps[:2] == [5.0, 24.0]
+
+
+def test_stalled_count_backs_off_then_hands_back(monkeypatch):
+    result, sleeps, _ = _confirm(monkeypatch, [50])
+    assert (result.confirmed, result.stalled, result.remaining) == (False, True, 50)
+    assert sleeps == [5.0, 10.0, 20.0]
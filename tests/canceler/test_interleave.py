@@ -0,0 +1,18 @@
+from activity import _interleave
+
+
+def test_rows_alternate_between_workloads():
+    workloads = ["1", "1", "1", "1", "2", "3"]
+    assert _interleave(workloads) == [0, 4, 5, 1, 2, 3]
+
+
+def test_every_row_appears_once_in_a_stable_order():
+    workloads = ["a", "b"] * 50 + ["a"] * 100
+    order = _interleave(workloads)
+    assert sorted(order) == list(range(len(workloads)))
+    assert _interleave(workloads) == order
+
+
+def test_single_workload_keeps_page_order():
+    assert _interleave(["7"] * 5) == [0, 1, 2, 3, 4]
+    assert _interleave([]) == []
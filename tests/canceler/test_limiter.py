@@ -0,0 +1,138 @@
+import asyncio
+
+import pytest
+from temporalio.service import RPCError, RPCStatusCode
+
+from limiter import AdaptiveLimiter
+
+
+def test_healthy_calls_grow_the_limit_up_to_the_ceiling():
+    async def scenario():
+        limiter = AdaptiveLimiter("test", initial=2, maximum=3, p99_target=10)
+        for _ in range(4):
+            async with limiter.slot():
+                pass
+        # +1/limit per call: 2 -> 2.5 -> 2.9 -> 3 (capped)
+        assert limiter.limit == 3
+        assert limiter.completed == 4
+
+    asyncio.run(scenario())
+
+
+def test_throttling_halves_the_limit_once_per_cooldown():
+    async def scenario():
+        limiter = AdaptiveLimiter("test", initial=8, maximum=8, p99_target=10, cooldown=60)
+        for _ in range(2):
+            with pytest.raises(RPCError):
+                async with limiter.slot():
+                    raise RPCError("slow down", RPCStatusCode.RESOURCE_EXHAUSTED, b"")
+        assert limiter.limit == 4
+
+    asyncio.run(scenario())
+
+
+def test_other_errors_do_not_back_off():
+    async def scenario():
+        limiter = AdaptiveLimiter("test", initial=4, maximum=8, p99_target=10)
+        with pytest.raises(RPCError):
+            async with limiter.slot():
+                raise RPCError("gone", RPCStatusCode.NOT_FOUND, b"")
+        assert limiter.limit > 4
+
+    asyncio.run(scenario())
+
+
+def test_in_flight_never_exceeds_the_limit():
+    async def scenario():
+        limiter = AdaptiveLimiter("test", initial=2, maximum=2, p99_target=10)
+        peak = 0
+
+        async def call():
+            nonlocal peak
+            async with limiter.slot():
+                peak = max(peak, limiter.in_flight)
+                await asyncio.sleep(0.001)
+
+        await asyncio.gather(*(call() for _ in range(20)))
+        assert peak == 2
+        assert limiter.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_freed_slots_take_turns_across_keys():
+    async def scenario():
+        limiter = AdaptiveLimiter("test", initial=1, maximum=1, p99_target=10)
+        order = []
+        gate = asyncio.Event()
+
+        async def call(key):
+            async with limiter.slot(key):
+                order.append(key)
+                await gate.wait()
+
+        holder = asyncio.create_task(call("big"))
+        await asyncio.sleep(0)
+        # Five queued for one workload, then one for another
+        tasks = [asyncio.create_task(call("big")) for _ in range(5)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(call("small")))
+        await asyncio.sleep(0)
+        gate.set()
+        await asyncio.gather(holder, *tasks)
+        assert order.index("small") == 2
+
+    asyncio.run(scenario())
+
+
+def test_holders_that_call_again_queue_behind_other_keys():
+    async def scenario():
+        limiter = AdaptiveLimiter("test", initial=4, maximum=4, p99_target=10)
+        big_calls = 0
+        small_done_at = None
+
+        async def drain():
+            nonlocal big_calls
+            for _ in range(50):
+                async with limiter.slot("big"):
+                    await asyncio.sleep(0)
+                big_calls += 1
+
+        async def small():
+            nonlocal small_done_at
+            await asyncio.sleep(0)
+            for _ in range(5):
+                async with limiter.slot("small"):
+                    await asyncio.sleep(0)
+            small_done_at = big_calls
+
+        await asyncio.gather(*(drain() for _ in range(8)), small())
+        # Alternating turns serve the small workload within a few rounds, not after the big one drains
+        assert small_done_at is not None and small_done_at < 40
+        assert limiter.in_flight == 0 and limiter.waiting == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        limiter = AdaptiveLimiter("test", initial=1, maximum=1, p99_target=10)
+        gate = asyncio.Event()
+
+        async def hold():
+            async with limiter.slot("a"):
+                await gate.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        queued.cancel()
+        await asyncio.gather(queued, return_exceptions=True)
+        gate.set()
+        await holder
+        # Nothing stale left in the rotation to hold back the next caller
+        async with limiter.slot("b"):
+            assert limiter.in_flight == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,40 @@
+import asyncio
+
+from models import ShardResult, WorkflowPage
+from workflow import BulkCancelWorkflow
+
+
+def _workflow(local_round_rows, expected_rows):
+    wf = BulkCancelWorkflow()
+    wf.shard_count = 1
+    wf.local_round_rows = local_round_rows
+    wf.expected_rows = expected_rows
+    return wf
+
+
+def _empty_cluster(fake):
+    fake.activities["query_wf_executions_page"] = lambda *args: WorkflowPage()
+    fake.activities["terminate_stragglers"] = lambda *args: ShardResult()
+
+
+def test_zero_local_round_rows_disables_the_fast_path(fake_workflow):
+    _empty_cluster(fake_workflow)
+    wf = _workflow(0, 0)
+    asyncio.run(wf._terminate_new_executions(wf.target))
+    assert fake_workflow.names() == ["query_wf_executions_page"]
+
+
+def test_small_expected_pass_runs_as_a_local_round(fake_workflow):
+    _empty_cluster(fake_workflow)
+    wf = _workflow(200, 0)
+    asyncio.run(wf._terminate_new_executions(wf.target))
+    assert fake_workflow.names() == ["terminate_stragglers"]
+    _, args = fake_workflow.calls[0]
+    assert args[3] == 200
+
+
+def test_larger_expected_pass_lists_through_regular_activities(fake_workflow):
+    _empty_cluster(fake_workflow)
+    wf = _workflow(200, 201)
+    asyncio.run(wf._terminate_new_executions(wf.target))
+    assert fake_workflow.names() == ["query_wf_executions_page"]
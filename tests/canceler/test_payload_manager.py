@@ -0,0 +1,35 @@
+from temporalio.api.common.v1 import Payload
+
+from payload_manager import DecodeCache
+
+
+def _payload(name):
+    return Payload(data=name.encode())
+
+
+def test_least_recently_used_entry_goes_first():
+    cache = DecodeCache(max_bytes=10)
+    cache.put(("a", "zlib"), _payload("a"), 4)
+    cache.put(("b", "zlib"), _payload("b"), 4)
+    assert cache.get(("a", "zlib")) == _payload("a")
+    cache.put(("c", "zlib"), _payload("c"), 4)
+    assert cache.get(("b", "zlib")) is None
+    assert cache.get(("a", "zlib")) is not None and cache.get(("c", "zlib")) is not None
+    assert cache.bytes == 8
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_entry_larger_than_the_budget_is_not_cached():
+    cache = DecodeCache(max_bytes=10)
+    cache.put(("a", "zlib"), _payload("a"), 6)
+    cache.put(("big", "zlib"), _payload("big"), 11)
+    assert cache.get(("big", "zlib")) is None
+    assert cache.get(("a", "zlib")) is not None
+    assert cache.bytes == 6
+
+
+def test_putting_a_cached_key_again_counts_it_once():
+    cache = DecodeCache(max_bytes=10)
+    cache.put(("a", "zlib"), _payload("a"), 6)
+    cache.put(("a", "zlib"), _payload("a"), 6)
+    assert cache.bytes == 6
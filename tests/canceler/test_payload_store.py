@@ -0,0 +1,51 @@
+import asyncio
+import os
+import time
+
+from payload_store import PayloadStore
+
+
+def test_round_trip_through_mmap_for_each_codec(tmp_path):
+    data = b"workflow-id," * 10000
+    for compression in ("none", "zlib"):
+        store = PayloadStore(str(tmp_path / compression), compression=compression)
+        key, used = asyncio.run(store.put(data))
+        assert used == compression
+        assert asyncio.run(store.get(key, used)) == data
+
+
+def test_identical_payloads_share_a_blob(tmp_path):
+    store = PayloadStore(str(tmp_path), use_mmap=False)
+    first = asyncio.run(store.put(b"same"))
+    assert asyncio.run(store.put(b"same")) == first
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+def _blob(path, name, size, age, now):
+    file = path / name
+    file.write_bytes(b"x" * size)
+    os.utime(file, (now - age, now - age))
+    return file
+
+
+def test_sweep_removes_blobs_older_than_max_age(tmp_path):
+    now = time.time()
+    old = _blob(tmp_path, "old.zlib", 10, 1000, now)
+    new = _blob(tmp_path, "new.zlib", 10, 10, now)
+    assert PayloadStore(str(tmp_path)).sweep(max_age_seconds=100, max_total_bytes=1000) == (1, 10)
+    assert not old.exists() and new.exists()
+
+
+def test_sweep_trims_least_recently_used_blobs_to_the_size_budget(tmp_path):
+    now = time.time()
+    files = [_blob(tmp_path, f"{age}.zlib", 10, age, now) for age in (30, 20, 10)]
+    assert PayloadStore(str(tmp_path)).sweep(max_age_seconds=1000, max_total_bytes=15) == (2, 20)
+    assert [f.exists() for f in files] == [False, False, True]
+
+
+def test_sweep_leaves_writes_in_progress_alone(tmp_path):
+    now = time.time()
+    writing = _blob(tmp_path, "new.zlib.tmp", 10, 10, now)
+    stale = _blob(tmp_path, "stale.zlib.tmp", 10, 1000, now)
+    PayloadStore(str(tmp_path)).sweep(max_age_seconds=100, max_total_bytes=0)
+    assert writing.exists() and not stale.exists()
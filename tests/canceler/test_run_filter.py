@@ -0,0 +1,56 @@
+from models import RunFilter, CancelSettings
+
+
+def _filled(n, bits=2**20, hashes=5, prefix="wf"):
+    f = RunFilter(bits, hashes)
+    for i in range(n):
+        f.add(f"{prefix}-{i}", f"run-{i}")
+    return f
+
+
+def test_no_false_negatives_and_few_false_positives_at_capacity():
+    settings = CancelSettings()
+    f = _filled(settings.filter_max_runs, settings.filter_bits, settings.filter_hashes)
+    assert all(f.contains(f"wf-{i}", f"run-{i}") for i in range(0, settings.filter_max_runs, 97))
+    false_positives = sum(f.contains(f"other-{i}", "run") for i in range(20000))
+    assert false_positives / 20000 < 0.012
+
+
+def test_full_filter_dump_stays_small():
+    settings = CancelSettings()
+    dumped = _filled(settings.filter_max_runs, settings.filter_bits, settings.filter_hashes).dump()
+    assert len(dumped) < 256 * 1024
+
+
+def test_run_id_is_part_of_the_key():
+    f = _filled(10)
+    assert f.contains("wf-3", "run-3")
+    assert not f.contains("wf-3", "run-4")
+
+
+def test_dump_and_load_round_trip():
+    f = _filled(500)
+    loaded = RunFilter.load(f.dump())
+    assert (loaded.bits, loaded.hashes, loaded.count) == (f.bits, f.hashes, f.count)
+    assert loaded.data == f.data
+
+
+def test_union_merges_runs_and_counts():
+    a, b = _filled(100, prefix="a"), _filled(100, prefix="b")
+    a.union(RunFilter.load(b.dump()))
+    assert a.count == 200
+    assert a.contains("a-5", "run-5") and a.contains("b-5", "run-5")
+
+
+def test_union_ignores_a_differently_shaped_filter():
+    a, b = _filled(10), _filled(10, bits=2**16, prefix="b")
+    a.union(b)
+    assert a.count == 10
+    assert not a.contains("b-1", "run-1")
+
+
+def test_zero_bits_is_always_empty():
+    f = _filled(10, bits=0)
+    assert f.count == 0
+    assert not f.contains("wf-1", "run-1")
+    assert RunFilter.load(f.dump()).count == 0
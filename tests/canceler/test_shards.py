@@ -0,0 +1,58 @@
+import asyncio
+import bisect
+from datetime import datetime, timedelta, timezone
+
+from activity import _split_bounds
+from models import EPOCH, visibility_time
+
+
+def _counter(start_times, calls=None):
+    times = sorted(start_times)
+
+    async def count_before(bound: str) -> int:
+        if calls is not None:
+            calls.append(bound)
+        return bisect.bisect_left(times, bound)
+
+    return count_before
+
+
+def test_split_from_epoch_spreads_rows_evenly():
+    # Every row started in the last hour, as after a batch job; equal time slices from EPOCH would put them in one shard
+    now = datetime(2024, 6, 1, tzinfo=timezone.utc)
+    times = [visibility_time(now - timedelta(hours=1) + timedelta(milliseconds=36 * i)) for i in range(100000)]
+    bounds = asyncio.run(_split_bounds(_counter(times), EPOCH, visibility_time(now), 4, len(times)))
+    assert len(bounds) == 3
+    edges = [EPOCH, *bounds, visibility_time(now)]
+    sizes = [bisect.bisect_left(sorted(times), hi) - bisect.bisect_left(sorted(times), lo) for lo, hi in zip(edges, edges[1:])]
+    # Each bound lands within a tenth of a shard of its share, so a shard is off by at most two tenths
+    assert all(abs(size - 25000) <= 5000 for size in sizes), sizes
+
+
+def test_split_collapses_rows_at_one_instant():
+    now = datetime(2024, 6, 1, tzinfo=timezone.utc)
+    times = [visibility_time(now - timedelta(minutes=1))] * 1000
+    bounds = asyncio.run(_split_bounds(_counter(times), EPOCH, visibility_time(now), 4, len(times)))
+    assert bounds == sorted(set(bounds))
+    assert len(bounds) <= 1
+
+
+def test_recent_rows_are_bracketed_before_bisecting():
+    # Bisecting every bound down from EPOCH took 361 counts here, most of them finding none or all of the rows
+    now = datetime(2024, 6, 1, tzinfo=timezone.utc)
+    times = [visibility_time(now - timedelta(hours=1) + timedelta(milliseconds=36 * i)) for i in range(100000)]
+    calls = []
+    bounds = asyncio.run(_split_bounds(_counter(times, calls), EPOCH, visibility_time(now), 16, len(times)))
+    assert len(bounds) == 15
+    assert len(calls) <= 60
+    # Nothing is counted further back than the widening search needs to find the oldest rows
+    assert min(calls) >= visibility_time(now - timedelta(seconds=8 ** 5))
+
+
+def test_rows_spread_over_years_need_few_counts():
+    now = datetime(2024, 6, 1, tzinfo=timezone.utc)
+    times = [visibility_time(now - timedelta(days=3 * 365) + timedelta(seconds=947 * i)) for i in range(100000)]
+    calls = []
+    bounds = asyncio.run(_split_bounds(_counter(times, calls), EPOCH, visibility_time(now), 4, len(times)))
+    assert len(bounds) == 3
+    assert len(calls) <= 20
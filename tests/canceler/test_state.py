@@ -0,0 +1,50 @@
+from temporalio.converter import DataConverter
+
+from models import BulkCancelState, CancelSettings, TerminateSummary, Workloads
+from workflow import BulkCancelWorkflow
+
+
+def _round_trip(value, type_hint):
+    converter = DataConverter.default.payload_converter
+    return converter.from_payloads(converter.to_payloads([value]), [type_hint])[0]
+
+
+def test_snapshot_survives_continue_as_new():
+    before = BulkCancelWorkflow()
+    before.phase, before.sweep_from = "cleanup", "2024-01-01T00:00:00.000Z"
+    before.watermark, before.watermark_ids = "2024-01-01T00:05:00.000Z", ["a", "b"]
+    before.passes, before.attempt, before.runs = 7, 3, 2
+    before.batch_job_ids = ["job-0", "job-1"]
+    before.totals = TerminateSummary(terminated=10, failed=1, failed_by_status={"INTERNAL": 1})
+    before.totals.observe("terminated", 0.02)
+    before.concurrency, before.switch_to = 50, "direct"
+    before.closed_runs.add("wf-1", "run-1")
+
+    state = _round_trip(before._snapshot(), BulkCancelState)
+    assert isinstance(state.totals, TerminateSummary)
+    after = BulkCancelWorkflow()
+    after._restore(state)
+    assert (after.phase, after.sweep_from, after.watermark, after.watermark_ids) == (before.phase, before.sweep_from, before.watermark, before.watermark_ids)
+    assert (after.passes, after.attempt, after.runs) == (7, 3, 3)
+    assert after.batch_job_ids == before.batch_job_ids
+    assert after.totals == before.totals
+    assert (after.concurrency, after.switch_to) == (50, "direct")
+    assert after.closed_runs.contains("wf-1", "run-1")
+
+
+def test_state_from_before_the_watermark_was_set_restores_to_the_sweep_start():
+    after = BulkCancelWorkflow()
+    after._restore(_round_trip(BulkCancelState(phase="batch", sweep_from="2024-01-01T00:00:00.000Z"), BulkCancelState))
+    assert after.watermark == "2024-01-01T00:00:00.000Z"
+
+
+def test_settings_round_trip():
+    settings = CancelSettings(max_shards=4, batch_terminate=False, filter_bits=0)
+    assert _round_trip(settings, CancelSettings) == settings
+
+
+def test_workload_targets_decode_to_their_own_shape():
+    assert _round_trip(1, Workloads) == 1
+    assert _round_trip("1", Workloads) == "1"
+    assert _round_trip('WorkloadId = "1"', Workloads) == 'WorkloadId = "1"'
+    assert _round_trip([1, "2"], Workloads) == [1, "2"]
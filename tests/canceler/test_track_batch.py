@@ -0,0 +1,89 @@
+import asyncio
+from types import SimpleNamespace
+
+from temporalio.api.enums.v1 import BatchOperationState
+from temporalio.testing import ActivityEnvironment
+
+import activity
+from activity import track_batch
+from client_pool import ClientPool
+
+RUNNING = BatchOperationState.BATCH_OPERATION_STATE_RUNNING
+COMPLETED = BatchOperationState.BATCH_OPERATION_STATE_COMPLETED
+FAILED = BatchOperationState.BATCH_OPERATION_STATE_FAILED
+
+
+def _job(state, completed=0, failed=0, total=100):
+    return SimpleNamespace(state=state, complete_operation_count=completed, failure_operation_count=failed, total_operation_count=total)
+
+
+def _track(monkeypatch, jobs, max_wait_seconds=120):
+    """Run track_batch against describe responses that advance one step per poll, on a clock that only moves when
+    the activity sleeps. Returns the progress, the sleeps and the heartbeats."""
+    monkeypatch.delenv("TRACK_MIN_POLL_SECONDS", raising=False)
+    monkeypatch.delenv("TRACK_MAX_POLL_SECONDS", raising=False)
+    polls = {job_id: 0 for job_id in jobs}
+
+    async def describe_batch_operation(request):
+        steps = jobs[request.job_id]
+        step = steps[min(polls[request.job_id], len(steps) - 1)]
+        polls[request.job_id] += 1
+        return step
+
+    async def connect():
+        return SimpleNamespace(namespace="main", workflow_service=SimpleNamespace(describe_batch_operation=describe_batch_operation))
+
+    monkeypatch.setattr(activity, "CLIENTS", ClientPool(1, connect))
+    sleeps = []
+    beats = []
+    real_sleep = asyncio.sleep
+
+    async def scenario():
+        clock = [0.0]
+        monkeypatch.setattr(asyncio.get_running_loop(), "time", lambda: clock[0])
+
+        async def sleep(seconds):
+            sleeps.append(seconds)
+            clock[0] += seconds
+            await real_sleep(0)
+
+        monkeypatch.setattr(asyncio, "sleep", sleep)
+        env = ActivityEnvironment()
+        env.on_heartbeat = lambda *details: beats.append(details)
+        return await env.run(track_batch, list(jobs), max_wait_seconds)
+
+    return asyncio.run(scenario()), sleeps, beats
+
+
+def test_progress_adds_up_across_jobs(monkeypatch):
+    progress, sleeps, beats = _track(monkeypatch, {
+        "job-0": [_job(RUNNING, 50), _job(COMPLETED, 100)],
+        "job-1": [_job(COMPLETED, 98, 2)],
+    })
+    assert (progress.completed, progress.failed, progress.total) == (198, 2, 200)
+    assert progress.done and progress.failed_jobs == []
+    assert sleeps == [2.0]
+    assert beats == [(148, 2, 200), (198, 2, 200)]
+
+
+def test_failed_job_is_done_and_reported(monkeypatch):
+    progress, _, _ = _track(monkeypatch, {
+        "job-0": [_job(COMPLETED, 100)],
+        "job-1": [_job(FAILED, 10, 0)],
+    })
+    assert progress.done
+    assert progress.failed_jobs == ["job-1"]
+
+
+def test_sleep_follows_the_completion_rate(monkeypatch):
+    _, sleeps, _ = _track(monkeypatch, {
+        "job-0": [_job(RUNNING, 0), _job(RUNNING, 10), _job(RUNNING, 10), _job(COMPLETED, 100)],
+    })
+    # Min sleep first; then 10 rows in 2s leaves 90 rows, about 18s, so check back in 9s; then no progress, max sleep
+    assert sleeps == [2.0, 9.0, 30.0]
+
+
+def test_gives_up_at_max_wait_without_finishing(monkeypatch):
+    progress, sleeps, _ = _track(monkeypatch, {"job-0": [_job(RUNNING, 0)]}, max_wait_seconds=5)
+    assert not progress.done
+    assert sleeps == [2.0, 3.0]
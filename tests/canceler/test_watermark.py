@@ -0,0 +1,29 @@
+from activity import _new_wf_query
+from workflow import _merge_latest
+
+
+def test_merge_latest_keeps_newer_mark():
+    assert _merge_latest("2024-01-01T00:00:01.000Z", ["a"], "2024-01-01T00:00:00.000Z", ["b"]) == ("2024-01-01T00:00:01.000Z", ["a"])
+    assert _merge_latest("2024-01-01T00:00:00.000Z", ["a"], "2024-01-01T00:00:01.000Z", ["b"]) == ("2024-01-01T00:00:01.000Z", ["b"])
+
+
+def test_merge_latest_unions_ids_at_the_same_instant():
+    latest, ids = _merge_latest("2024-01-01T00:00:00.000Z", ["a", "b"], "2024-01-01T00:00:00.000Z", ["b", "c"])
+    assert latest == "2024-01-01T00:00:00.000Z"
+    assert ids == ["a", "b", "c"]
+
+
+def test_merge_latest_ignores_empty_pages():
+    assert _merge_latest("2024-01-01T00:00:00.000Z", ["a"], None, []) == ("2024-01-01T00:00:00.000Z", ["a"])
+    assert _merge_latest(None, [], "2024-01-01T00:00:00.000Z", ["a"]) == ("2024-01-01T00:00:00.000Z", ["a"])
+
+
+def test_query_excludes_tie_breaker_ids_at_the_watermark():
+    query = _new_wf_query('WorkloadId = "1"', "2024-01-01T00:00:00.000Z", ["a", "b"])
+    assert query == ('(WorkloadId = "1") AND ExecutionStatus = "Running" AND `StartTime`>="2024-01-01T00:00:00.000Z"'
+                     ' AND WorkflowId NOT IN ("a", "b")')
+
+
+def test_query_bounds_a_shard_range():
+    query = _new_wf_query('WorkloadId = "1"', "2024-01-01T00:00:00.000Z", until="2024-01-02T00:00:00.000Z", extra_filter="ParentWorkflowId IS NULL")
+    assert query.endswith(' AND `StartTime`<"2024-01-02T00:00:00.000Z" AND (ParentWorkflowId IS NULL)')
@@ -0,0 +1,82 @@
+import asyncio
+import uuid
+from typing import List, Optional
+
+import pytest
+from temporalio import activity
+from temporalio.testing import WorkflowEnvironment
+from temporalio.worker import Worker
+
+from config import STRATEGY_DIRECT
+from models import CancelProgress, ConfirmResult, ShardResult, TerminateSummary, WorkflowPage
+from workflow import BulkCancelWorkflow, CancelShardWorkflow
+
+RUNNING = [(f"wf-{i}", f"run-{i}") for i in range(3)]
+
+
+class FakeCluster:
+    """Stands in for visibility and the terminate RPCs: lists RUNNING once, then finds nothing left."""
+
+    def __init__(self):
+        self.terminated: List[str] = []
+        self.confirms = 0
+
+    def activities(self):
+        @activity.defn(name="query_wf_executions_page")
+        async def query_wf_executions_page(target: str, timestamp: str, next_page_token: Optional[str] = None,
+                                           exclude_ids: Optional[List[str]] = None, until: Optional[str] = None,
+                                           extra_filter: Optional[str] = None) -> WorkflowPage:
+            rows = [r for r in RUNNING if r[0] not in self.terminated]
+            return WorkflowPage(
+                workflow_ids=[wf_id for wf_id, _ in rows],
+                run_ids=[run_id for _, run_id in rows],
+                latest_start_time="2024-01-01T00:00:00.000Z" if rows else None,
+                latest_ids=[wf_id for wf_id, _ in rows],
+            )
+
+        @activity.defn(name="bulk_cancel_workflows")
+        async def bulk_cancel_workflows(workflow_ids: List[str], run_ids: Optional[List[str]] = None, concurrency: int = 0,
+                                        workloads: Optional[List[str]] = None) -> TerminateSummary:
+            self.terminated.extend(workflow_ids)
+            return TerminateSummary(terminated=len(workflow_ids))
+
+        @activity.defn(name="terminate_stragglers")
+        async def terminate_stragglers(target: str, timestamp: str, exclude_ids: Optional[List[str]] = None,
+                                       max_rows: int = 200, skip: Optional[str] = None) -> ShardResult:
+            return ShardResult()
+
+        @activity.defn(name="confirm_all_canceled")
+        async def confirm_all_canceled(target: str) -> ConfirmResult:
+            self.confirms += 1
+            return ConfirmResult(confirmed=True)
+
+        return [query_wf_executions_page, bulk_cancel_workflows, terminate_stragglers, confirm_all_canceled]
+
+
+def test_direct_strategy_terminates_and_confirms():
+    async def scenario():
+        try:
+            env = await WorkflowEnvironment.start_time_skipping()
+        except RuntimeError as err:
+            # The test server is downloaded on first use
+            pytest.skip(f"time-skipping test server unavailable: {err}")
+        cluster = FakeCluster()
+        task_queue = f"canceler-{uuid.uuid4()}"
+        async with env:
+            async with Worker(env.client, task_queue=task_queue, workflows=[BulkCancelWorkflow, CancelShardWorkflow],
+                              activities=cluster.activities()):
+                handle = await env.client.start_workflow(
+                    BulkCancelWorkflow.run,
+                    args=(1, 1.0, 5, 1, STRATEGY_DIRECT),
+                    id=f"bulk-cancel-{uuid.uuid4()}",
+                    task_queue=task_queue,
+                )
+                assert await handle.result() == "Cancelation Successful"
+                progress = await handle.query(BulkCancelWorkflow.progress, result_type=CancelProgress)
+        assert sorted(cluster.terminated) == [wf_id for wf_id, _ in RUNNING]
+        assert cluster.confirms == 1
+        assert progress.fully_canceled
+        assert (progress.strategy, progress.terminated, progress.failed) == (STRATEGY_DIRECT, 3, 0)
+        assert progress.passes == 2
+
+    asyncio.run(scenario())
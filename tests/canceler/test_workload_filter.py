@@ -0,0 +1,28 @@
+import pytest
+
+from models import workload_filter
+
+
+def test_single_ids():
+    assert workload_filter(1) == 'WorkloadId = "1"'
+    assert workload_filter([7]) == 'WorkloadId = "7"'
+
+
+def test_digit_only_string_is_a_workload_id():
+    assert workload_filter("1") == 'WorkloadId = "1"'
+    assert workload_filter(" 42 ") == 'WorkloadId = "42"'
+
+
+def test_lists_become_one_in_clause():
+    assert workload_filter([1, "2"]) == 'WorkloadId IN ("1", "2")'
+
+
+def test_other_strings_are_filters():
+    query = 'WorkloadId = "1" AND WorkflowType = "ChildWorkflow"'
+    assert workload_filter(query) == query
+
+
+@pytest.mark.parametrize("workloads", [[], "", "   "])
+def test_empty_targets_are_rejected(workloads):
+    with pytest.raises(ValueError):
+        workload_filter(workloads)